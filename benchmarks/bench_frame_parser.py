@@ -0,0 +1,65 @@
+# benchmarks/bench_frame_parser.py
+"""
+Microbenchmark: original onWebDisplay parsing vs. the `frame_parser` fast path.
+
+Usage: python benchmarks/bench_frame_parser.py [--size-kb 300] [--iterations 200]
+"""
+import argparse
+import base64
+import binascii
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from frame_parser import get_method, extract_frame, JSON_BACKEND, WEB_DISPLAY
+
+
+def make_message(size_kb):
+    """ Builds an onWebDisplay message shaped like MRL's, with a random payload. """
+    payload = base64.b64encode(os.urandom(size_kb * 1024)).decode("ascii")
+    inner = json.dumps({"name": "i01.opencv", "data": f"data:image/jpg;base64,{payload}"})
+    return json.dumps({"name": "webgui", "method": WEB_DISPLAY, "data": [inner]})
+
+
+def original_path(message):
+    """ What `subscribe_to_channel` + `decode_frame` did before the fast path. """
+    msg = json.loads(message)
+    if msg.get("method") == WEB_DISPLAY:
+        frame_data = json.loads(msg.get("data")[0]).get("data").replace("data:image/jpg;base64,", "")
+        return base64.b64decode(frame_data)
+
+
+def fast_path(message):
+    if get_method(message) == WEB_DISPLAY:
+        return binascii.a2b_base64(extract_frame(message))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--size-kb", type=int, default=300, help="Decoded JPEG size in KB")
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    message_str = make_message(args.size_kb)
+    message_bytes = message_str.encode("utf-8")
+    assert original_path(message_str) == fast_path(message_bytes) == fast_path(message_str)
+
+    cases = [
+        ("original (str, json x2 + replace + b64decode)", lambda: original_path(message_str)),
+        ("fast path (str message)", lambda: fast_path(message_str)),
+        ("fast path (bytes message, recv(decode=False))", lambda: fast_path(message_bytes)),
+    ]
+
+    print(f"Payload: {len(message_bytes) / 1024:.0f} KB message, JSON backend: {JSON_BACKEND}")
+    baseline = None
+    for name, fn in cases:
+        best = min(timeit.repeat(fn, number=args.iterations, repeat=5)) / args.iterations
+        baseline = baseline or best
+        print(f"{name:<50} {best * 1e3:8.3f} ms/frame  ({baseline / best:5.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
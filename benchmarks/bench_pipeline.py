@@ -0,0 +1,263 @@
+# benchmarks/bench_pipeline.py
+"""
+Benchmark: the vision pipeline per stage and end to end on a fixed frame corpus.
+
+Stages: decode (`decode_frame`), yolo (`run_yolo`), face (`run_mediapipe_face_detection`),
+hands (`run_mediapipe_hand_tracking`), gui (the renderer's display conversion) and
+end_to_end (decode + scheduled detectors at --fps + drawing + gui). Reports p50/p95/p99
+latency, throughput, peak RSS and per-frame allocations (tracemalloc, separate pass).
+
+Usage: python benchmarks/bench_pipeline.py [--recording session.mrlrec | --images DIR]
+           [--frames 30] [--repeat 3] [--output results.json] [--baseline baseline.json]
+
+Results are written as JSON. With --baseline, they're compared against a stored run
+(created from this run if it doesn't exist yet) and the exit code is 1 if a stage
+got slower than --threshold.
+"""
+import argparse
+import base64
+import datetime
+import glob
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+from PIL import Image
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import YOLO_BACKEND, YOLO_IMGSZ, FRAME_WIDTH, FRAME_HEIGHT
+from frame_pool import FrameBuffers
+from models import MODELS
+from motion_gate import MotionGate
+from opencv_utils import decode_frame, run_yolo, run_mediapipe_face_detection, run_mediapipe_hand_tracking
+from pipeline import infer_frame
+from recording import Recording
+from scheduler import create_default_scheduler
+
+STAGE_MODELS = {"yolo": "yolo", "face": "face_mesh", "hands": "hands"}
+
+
+def synthetic_corpus(count, width=640, height=480):
+    """ Deterministic camera-like JPEGs: a moving shape over a noisy gradient. """
+    rng = np.random.default_rng(0)
+    background = np.linspace(40, 200, width, dtype=np.float32)[None, :, None].repeat(height, 0).repeat(3, 2)
+    frames = []
+    for i in range(count):
+        image = np.clip(background + rng.normal(0, 12, background.shape), 0, 255).astype(np.uint8)
+        x = 100 + (i * 15) % (width - 250)
+        cv2.rectangle(image, (x, 120), (x + 120, 420), (60, 90, 160), -1)
+        cv2.circle(image, (x + 60, 90), 45, (150, 180, 220), -1)
+        ok, jpeg = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, 80])
+        frames.append(jpeg.tobytes())
+    return frames
+
+
+def load_corpus(args):
+    """ JPEG frames from a recording, a directory of images, or the synthetic corpus, as base64 like MRL sends them. """
+    if args.recording:
+        frames = [jpeg for _, jpeg in Recording(args.recording).frames()][:args.frames]
+    elif args.images:
+        frames = []
+        for path in sorted(glob.glob(os.path.join(args.images, "*.jp*g")))[:args.frames]:
+            with open(path, "rb") as f:
+                frames.append(f.read())
+    else:
+        frames = synthetic_corpus(args.frames)
+    if not frames:
+        sys.exit("Empty frame corpus")
+    return [base64.b64encode(jpeg) for jpeg in frames]
+
+
+def wait_for_models(timeout):
+    MODELS.start()
+    deadline = time.monotonic() + timeout
+    while any(state in ("pending", "loading") for state in MODELS.states.values()) and time.monotonic() < deadline:
+        time.sleep(0.1)
+    return dict(MODELS.states)
+
+
+def gui_conversion(frame, image):
+    """ What `gui.GuiRenderer` does per displayed frame; `tobytes()` stands in for the copy Tk's `paste()` makes. """
+    np.copyto(frame, image)
+    return Image.frombuffer("RGB", (frame.shape[1], frame.shape[0]), frame, "raw", "RGB", 0, 1).tobytes()
+
+
+def make_stages(args):
+    """ Stage name -> `run(b64, buffers, i)`, where only the stage's own work is timed. """
+    display = np.empty((FRAME_HEIGHT, FRAME_WIDTH, 3), dtype=np.uint8)
+    scheduler = create_default_scheduler()
+    motion_gate = MotionGate()
+
+    def decoded(run):
+        def stage(b64, buffers, i):
+            decode_frame(b64, buffers)
+            start = time.perf_counter()
+            run(buffers)
+            return time.perf_counter() - start
+        return stage
+
+    def timed(run):
+        def stage(b64, buffers, i):
+            start = time.perf_counter()
+            run(b64, buffers, i)
+            return time.perf_counter() - start
+        return stage
+
+    def end_to_end(b64, buffers, i):
+        decode_frame(b64, buffers)
+        # Frames arrive at --fps, so rate-limited detectors run as they would live
+        result = infer_frame(buffers, scheduler, motion_gate, now=i / args.fps)
+        gui_conversion(display, result["image"])
+
+    return {
+        "decode": timed(lambda b64, buffers, i: decode_frame(b64, buffers)),
+        "yolo": decoded(lambda buffers: run_yolo(buffers.bgr)),
+        "face": decoded(lambda buffers: run_mediapipe_face_detection(buffers.rgb)),
+        "hands": decoded(lambda buffers: run_mediapipe_hand_tracking(buffers.rgb)),
+        "gui": decoded(lambda buffers: gui_conversion(display, buffers.rgb)),
+        "end_to_end": timed(end_to_end),
+    }, scheduler
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    # ru_maxrss is in KB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def measure(stage, corpus, buffers, repeat, alloc_frames):
+    # Warm-up pass (first-call allocations, caches, lazy imports)
+    stage(corpus[0], buffers, 0)
+
+    latencies = []
+    i = 0
+    for _ in range(repeat):
+        for b64 in corpus:
+            i += 1
+            latencies.append(stage(b64, buffers, i))
+
+    # Separate pass for allocations: tracemalloc slows everything down
+    peaks = []
+    tracemalloc.start()
+    for b64 in corpus[:alloc_frames]:
+        i += 1
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        stage(b64, buffers, i)
+        peaks.append(tracemalloc.get_traced_memory()[1] - before)
+    tracemalloc.stop()
+
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) * 1000
+    return {
+        "frames": len(latencies),
+        "p50_ms": round(float(p50), 2),
+        "p95_ms": round(float(p95), 2),
+        "p99_ms": round(float(p99), 2),
+        "mean_ms": round(float(np.mean(latencies)) * 1000, 2),
+        "fps": round(len(latencies) / sum(latencies), 1),
+        "peak_rss_mb": peak_rss_mb(),
+        "alloc_peak_kb_per_frame": round(float(np.mean(peaks)) / 1024, 1) if peaks else None,
+    }
+
+
+def compare(results, baseline, threshold):
+    """ Prints the change of each stage vs. the baseline. Returns the stages that regressed. """
+    regressions = []
+    print(f"\n{'stage':<12} {'p50 ms':>16} {'p95 ms':>16} {'fps':>16}")
+    for name, current in results["stages"].items():
+        previous = baseline.get("stages", {}).get(name)
+        if not previous or "p50_ms" not in current or "p50_ms" not in previous:
+            continue
+        cells = []
+        for key in ("p50_ms", "p95_ms", "fps"):
+            change = (current[key] - previous[key]) / previous[key] if previous[key] else 0.0
+            cells.append(f"{previous[key]:>6} → {current[key]:<6} {change:+.0%}".rjust(16))
+        print(f"{name:<12} {cells[0]} {cells[1]} {cells[2]}")
+        if previous["p50_ms"] and (current["p50_ms"] - previous["p50_ms"]) / previous["p50_ms"] > threshold:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--recording", help="Recording to take frames from (see recording.py)")
+    parser.add_argument("--images", help="Directory of JPEG frames")
+    parser.add_argument("--frames", type=int, default=30, help="Corpus size")
+    parser.add_argument("--repeat", type=int, default=3, help="Passes over the corpus per stage")
+    parser.add_argument("--alloc-frames", type=int, default=5, help="Frames in the tracemalloc pass")
+    parser.add_argument("--stages", nargs="+", default=["decode", "yolo", "face", "hands", "gui", "end_to_end"])
+    parser.add_argument("--fps", type=float, default=15.0, help="Simulated camera rate for end_to_end")
+    parser.add_argument("--model-timeout", type=float, default=120.0)
+    parser.add_argument("--output", default="bench_pipeline.json")
+    parser.add_argument("--baseline", help="Baseline JSON to compare with (written if missing)")
+    parser.add_argument("--threshold", type=float, default=0.10, help="p50 slowdown that counts as a regression")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args)
+    states = wait_for_models(args.model_timeout)
+    stages, scheduler = make_stages(args)
+    buffers = FrameBuffers()
+
+    results = {
+        "meta": {
+            "date": datetime.datetime.now().isoformat(timespec="seconds"),
+            "machine": platform.machine(),
+            "processor": platform.processor(),
+            "cpus": os.cpu_count(),
+            "python": platform.python_version(),
+            "opencv": cv2.__version__,
+            "numpy": np.__version__,
+            "yolo_backend": YOLO_BACKEND,
+            "yolo_imgsz": YOLO_IMGSZ,
+            "corpus": args.recording or args.images or "synthetic",
+            "frames": len(corpus),
+            "models": states,
+        },
+        "stages": {},
+    }
+
+    print(f"{'stage':<12} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'fps':>7} {'rss MB':>7} {'alloc KB':>9}")
+    for name in args.stages:
+        model = STAGE_MODELS.get(name)
+        if model and states.get(model) != "ready":
+            results["stages"][name] = {"skipped": f"{model} {states.get(model)}"}
+            print(f"{name:<12} skipped ({model} {states.get(model)})")
+            continue
+        stats = measure(stages[name], corpus, buffers, args.repeat, args.alloc_frames)
+        results["stages"][name] = stats
+        print(f"{name:<12} {stats['p50_ms']:>8} {stats['p95_ms']:>8} {stats['p99_ms']:>8} {stats['fps']:>7} {stats['peak_rss_mb']:>7} {stats['alloc_peak_kb_per_frame']:>9}")
+    scheduler.shutdown()
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+    if args.baseline:
+        if not os.path.exists(args.baseline):
+            with open(args.baseline, "w", encoding="utf-8") as f:
+                json.dump(results, f, indent=2)
+            print(f"No baseline yet, saved this run as {args.baseline}")
+            return
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\nRegressed (p50 more than {args.threshold:.0%} slower): {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+# benchmarks/bench_yolo_backends.py
+"""
+Benchmark: YOLO inference latency per backend (ultralytics / onnx / openvino) on the CPU.
+
+Usage: python benchmarks/bench_yolo_backends.py [--image frame.jpg] [--imgsz 640 480 320] [--runs 50]
+Backends that aren't installed are skipped.
+"""
+import argparse
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from yolo_backends import BACKENDS, create_backend, boxes_to_detections
+
+
+def load_frame(path, width=1024, height=768):
+    if path:
+        image = cv2.imread(path, cv2.IMREAD_COLOR)
+        if image is None:
+            sys.exit(f"Can't read {path}")
+        return cv2.resize(image, (width, height))
+    # Deterministic noise frame when no image is given
+    return np.random.default_rng(0).integers(0, 255, (height, width, 3), dtype=np.uint8)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--image", help="BGR test frame (default: random noise)")
+    parser.add_argument("--weights", default="yolov8n.pt")
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS))
+    parser.add_argument("--imgsz", nargs="+", type=int, default=[640])
+    parser.add_argument("--runs", type=int, default=50)
+    args = parser.parse_args()
+
+    frame = load_frame(args.image)
+
+    print(f"{'backend':<12} {'imgsz':>5} {'load s':>7} {'warmup s':>8} {'p50 ms':>8} {'p95 ms':>8} {'fps':>6} dets")
+    for name in args.backends:
+        for imgsz in args.imgsz:
+            try:
+                start = time.perf_counter()
+                backend = create_backend(name, args.weights, imgsz=imgsz)
+                load = time.perf_counter() - start
+            except ImportError as e:
+                print(f"{name:<12} {imgsz:>5} skipped ({e})")
+                continue
+
+            warmup = backend.warmup(frame.shape)
+            latencies = []
+            for _ in range(args.runs):
+                start = time.perf_counter()
+                detections = boxes_to_detections(*backend.predict(frame), backend.names)
+                latencies.append(time.perf_counter() - start)
+
+            p50, p95 = np.percentile(latencies, [50, 95]) * 1000
+            print(f"{name:<12} {imgsz:>5} {load:>7.2f} {warmup:>8.2f} {p50:>8.1f} {p95:>8.1f} {1000 / p50:>6.1f} {len(detections)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,22 +1,144 @@
 # config.py
-import mediapipe as mp
-from ultralytics import YOLO
+# Settings only: the models themselves are loaded in the background by `models.py`
+import os
+
+# Directory of this file, for data files that shouldn't depend on the working directory
+HERE = os.path.dirname(os.path.abspath(__file__))
 
 # WebSocket server URL
 URI = "ws://127.0.0.1:8888/api/messages"
+
+# Video streams: name -> (MRL WebSocket URI, display source or None for any). The first one
+# is the primary stream: shown in the GUI, asked about by "Ask Vision", sent commands. E.g.
+# both eye cameras of one robot plus a second robot:
+# STREAMS = {"left": (URI, "i01.left"), "right": (URI, "i01.right"), "robot2": ("ws://10.0.0.2:8888/api/messages", None)}
+STREAMS = {"main": (URI, None)}
 #URI = "ws://192.168.0.100:8080/api/messages"
 
-# YOLO Model
-MODEL = YOLO("yolov8n.pt")
+# WebSocket connection: keepalive ping interval (s), max queued outbound messages,
+# how long a burst of outbound commands is collected before sending (s), and the
+# reconnect backoff range (s)
+WS_PING_INTERVAL = 20
+WS_OUTBOUND_QUEUE = 100
+WS_COALESCE_WINDOW = 0.05
+WS_BACKOFF_MIN = 0.5
+WS_BACKOFF_MAX = 30.0
+
+# Size every frame is resized to before detection & display
+FRAME_WIDTH = 1024
+FRAME_HEIGHT = 768
+
+# Log level for the buffered `inmoov.*` loggers ("DEBUG" also logs every received method)
+LOG_LEVEL = "INFO"
+
+# GUI: maximum display frame rate, and how often Tk input events are pumped (seconds)
+DISPLAY_FPS = 20
+GUI_PUMP_INTERVAL = 0.01
+
+# Seconds between video pipeline stats printouts (received/processed/dropped frames & FPS)
+STATS_INTERVAL = 10.0
+
+# Detector scheduling: target rate in Hz (None = every processed frame) and
+# priority (lower runs first). Results are reused for the overlays in between.
+DETECTORS = {
+    "yolo": {"rate": 10, "priority": 0},
+    "face": {"rate": 5, "priority": 1},
+    "hands": {"rate": 5, "priority": 2},
+}
+# Detectors run at once per frame (None = all that are due); when more are due, the
+# lower-priority ones wait for the next frame
+DETECTOR_SLOTS = 2
+
+# Motion gating: skip the detectors when the mean gray-level difference to the last
+# analysed frame is below MOTION_THRESHOLD (None = always run). Frames are subsampled
+# every MOTION_STEP pixels; a refresh is forced after MOTION_MAX_STATIC seconds.
+MOTION_THRESHOLD = 3.0
+MOTION_STEP = 8
+MOTION_MAX_STATIC = 2.0
+
+# Tracking (tracking.py): YOLO boxes keep an ID across frames when they overlap by
+# TRACK_IOU; a track is shown after TRACK_MIN_HITS matches and dropped after
+# TRACK_MAX_MISSED YOLO runs without one. The face/hand flags only flip after holding
+# for STATE_ON_DELAY (on) / STATE_OFF_DELAY (off) seconds.
+TRACKING = True
+TRACK_IOU = 0.3
+TRACK_MIN_HITS = 2
+TRACK_MAX_MISSED = 3
+STATE_ON_DELAY = 0.2
+STATE_OFF_DELAY = 0.6
+
+# Region-of-interest cascade: with ROI_CASCADE the face mesh and hand tracking only look
+# at the area around YOLO's ROI_LABEL boxes (grown by ROI_PADDING of their size, downscaled
+# to at most ROI_MAX_SIDE px), and don't run at all while nobody is in view. When that area
+# covers more than ROI_MAX_AREA of the frame they get the whole frame instead.
+ROI_CASCADE = False
+ROI_LABEL = "person"
+ROI_PADDING = 0.15
+ROI_MAX_SIDE = 512
+ROI_MAX_AREA = 0.6
+
+# YOLO Model: backend is "ultralytics" (PyTorch), "onnx" (ONNX Runtime) or "openvino".
+# The .pt weights are exported once for the ONNX/OpenVINO backends. YOLO_IMGSZ is the
+# inference input size (smaller = faster on CPU).
+YOLO_BACKEND = "ultralytics"
+YOLO_WEIGHTS = "yolov8n.pt"
+YOLO_IMGSZ = 640
+YOLO_CONF = 0.25
+# Frames from several STREAMS share one YOLO inference (see inference.YoloBatcher)
+YOLO_MAX_BATCH = 4
+YOLO_BATCH_WINDOW = 0.01  # seconds to wait for the other streams' frames
+INFERENCE_WORKERS = None  # shared detector threads, None = 3 per stream
 
 # Mediapipe Hand Tracking
-MP_HANDS = mp.solutions.hands
-HANDS = MP_HANDS.Hands(min_detection_confidence=0.4, min_tracking_confidence=0.4)
-MP_DRAWING = mp.solutions.drawing_utils
+HANDS_CONFIDENCE = 0.4
 
 # Mediapipe Face Mesh
-MP_FACE_MESH = mp.solutions.face_mesh
-FACE_MESH = MP_FACE_MESH.FaceMesh(min_detection_confidence=0.5, min_tracking_confidence=0.5)
+FACE_MESH_CONFIDENCE = 0.5
+
+# Ollama (local LLM)
+OLLAMA_URL = "http://localhost:11434"
+# Seconds Ollama may go silent mid-request (e.g. loading the model) before it's given up on
+OLLAMA_READ_TIMEOUT = 120
+LLM_MODEL = "llama3.2"
+LLM_SYSTEM_PROMPT = "You are a friendly AI assistant."
+# Conversation history kept per visitor (estimated tokens), and how long Ollama keeps the model loaded
+LLM_TOKEN_BUDGET = 2048
+LLM_KEEP_ALIVE = "30m"
+
+# "Ask Vision": multimodal model answering questions about the live frame. The frame is
+# downscaled to VISION_MAX_SIDE px and JPEG-encoded once; the encoding is reused for
+# VISION_FRAME_MAX_AGE seconds.
+VISION_MODEL = "llava"
+VISION_SYSTEM_PROMPT = "You are the eyes of an InMoov robot. Answer briefly, using the camera image and the detections you are given."
+VISION_MAX_SIDE = 512
+VISION_JPEG_QUALITY = 80
+VISION_FRAME_MAX_AGE = 1.0
+
+# Response cache for LLM / chatbot questions: max answers kept, seconds each is valid,
+# and the file it's persisted to (None = memory only)
+RESPONSE_CACHE_SIZE = 256
+RESPONSE_CACHE_TTL = 24 * 3600
+RESPONSE_CACHE_PATH = os.path.join(HERE, "response_cache.json")
+
+# MRL service registry (REST API)
+MRL_API_URL = "http://localhost:8888/api/service"
+MRL_REGISTRY_TTL = 60.0  # seconds services (gestures, peers) are cached
+
+# Per-frame tracing: Prometheus text endpoint (None = off) and on-screen overlay
+METRICS_HOST = "127.0.0.1"
+METRICS_PORT = 9108
+METRICS_WINDOW = 500  # samples kept per stage for the rolling percentiles
+METRICS_OVERLAY = False
+
+# Headless mode (headless.py): event WebSocket / MJPEG server
+HEADLESS_HOST = "127.0.0.1"
+HEADLESS_PORT = 8765
+HEADLESS_CLIENT_QUEUE = 50  # events buffered per client before the oldest are dropped
+MJPEG_FPS = 10
+MJPEG_QUALITY = 80
+
+# Record the raw MRL message stream to this file for replaying with mock_mrl.py (None = off)
+RECORD_PATH = None
 
 # Global Variables
 websocket = None
\ No newline at end of file
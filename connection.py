@@ -0,0 +1,170 @@
+# connection.py
+import asyncio
+import random
+import time
+from collections import OrderedDict
+import websockets
+from config import URI, WS_PING_INTERVAL, WS_OUTBOUND_QUEUE, WS_COALESCE_WINDOW, WS_BACKOFF_MIN, WS_BACKOFF_MAX
+from logger import get_logger
+
+log = get_logger(__name__)
+
+
+class ConnectionManager:
+    """
+    Keeps a WebSocket connection to MRL alive and owns all traffic on it.
+
+    - Reconnects with exponential backoff (plus jitter) whenever the connection fails or
+      drops, and keeps it alive with WebSocket pings.
+    - `send()` never blocks and works while disconnected: messages go into a bounded
+      outbound queue (oldest dropped when full) that is flushed after reconnecting.
+    - Bursts are coalesced: the sender waits `coalesce_window` seconds after the first
+      queued message and then flushes everything in one go; messages sent with the same
+      `key` replace each other, so only the latest of e.g. start/stop recording is sent.
+    - `stats()` reports connect latency, uptime and queue counters.
+    """
+
+    def __init__(self, uri=URI, on_message=None, on_connect=None, queue_size=WS_OUTBOUND_QUEUE,
+                 coalesce_window=WS_COALESCE_WINDOW, ping_interval=WS_PING_INTERVAL,
+                 backoff_min=WS_BACKOFF_MIN, backoff_max=WS_BACKOFF_MAX):
+        self.uri = uri
+        self.on_message = on_message
+        self.on_connect = on_connect
+        self.queue_size = queue_size
+        self.coalesce_window = coalesce_window
+        self.ping_interval = ping_interval
+        self.backoff_min = backoff_min
+        self.backoff_max = backoff_max
+
+        self.websocket = None
+        self.outbound = OrderedDict()  # key -> payload, in send order
+        self.outbound_event = asyncio.Event()
+        self.next_id = 0
+
+        self.started = time.monotonic()
+        self.connected_at = None
+        self.connected_time = 0.0
+        self.connects = 0
+        self.failures = 0
+        self.connect_latency = None
+        self.sent = 0
+        self.dropped = 0
+        self.coalesced = 0
+
+    @property
+    def connected(self):
+        return self.websocket is not None
+
+    def send(self, payload, key=None):
+        """ Queues a message for sending. Messages with the same `key` replace each other. """
+        if key is None:
+            key = self.next_id
+            self.next_id += 1
+        elif key in self.outbound:
+            del self.outbound[key]
+            self.coalesced += 1
+
+        self.outbound[key] = payload
+        while len(self.outbound) > self.queue_size:
+            self.outbound.popitem(last=False)
+            self.dropped += 1
+        self.outbound_event.set()
+
+    async def run(self):
+        """ Connects, receives and reconnects forever. """
+        backoff = self.backoff_min
+        while True:
+            start = time.perf_counter()
+            try:
+                websocket = await websockets.connect(self.uri, ping_interval=self.ping_interval, max_size=None, compression="deflate")
+            except (OSError, asyncio.TimeoutError, websockets.WebSocketException) as e:
+                self.failures += 1
+                delay = backoff * random.uniform(0.8, 1.2)
+                log.warning(f"WebSocket connect failed ({e}), retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+                backoff = min(backoff * 2, self.backoff_max)
+                continue
+
+            self.connect_latency = time.perf_counter() - start
+            self.websocket = websocket
+            self.connects += 1
+            self.connected_at = time.monotonic()
+            backoff = self.backoff_min
+            log.info(f"Connected to WebSocket server in {self.connect_latency * 1000:.0f}ms.")
+            if self.on_connect:
+                self.on_connect()
+
+            sender = asyncio.create_task(self._sender(websocket))
+            try:
+                await self._receiver(websocket)
+            except (OSError, websockets.WebSocketException) as e:
+                log.warning(f"WebSocket connection lost: {e}")
+            finally:
+                sender.cancel()
+                self.websocket = None
+                self.connected_time += time.monotonic() - self.connected_at
+                self.connected_at = None
+                await websocket.close()
+
+    async def _receiver(self, websocket):
+        while True:
+            # ✅ Raw bytes: frames are sliced out without UTF-8 decoding the whole message
+            message = await websocket.recv(decode=False)
+            try:
+                self.on_message(message)
+            except Exception:
+                log.exception("Error handling message")
+
+    async def _sender(self, websocket):
+        while True:
+            if not self.outbound:
+                self.outbound_event.clear()
+                await self.outbound_event.wait()
+                # Let a burst of commands collect (and coalesce) before flushing
+                await asyncio.sleep(self.coalesce_window)
+
+            while self.outbound:
+                key, payload = next(iter(self.outbound.items()))
+                try:
+                    await websocket.send(payload)
+                    self.sent += 1
+                except websockets.ConnectionClosed:
+                    return  # The receiver reconnects, the queue is flushed then
+                except Exception:
+                    # E.g. a payload websockets can't send: retrying won't help, and would
+                    # stop everything queued behind it (and kill this task) for good
+                    log.exception(f"Dropping outbound message {key!r}")
+                    self.dropped += 1
+                # Only dequeue once sent (or dropped), so a send cut off by the connection
+                # closing is retried after reconnecting
+                if self.outbound.get(key) is payload:
+                    del self.outbound[key]
+
+    def register_metrics(self, metrics, prefix=""):
+        """ Exposes the outbound queue and connection counters (see `metrics.Metrics`), named with `prefix`. """
+        metrics.gauge(f"{prefix}ws_connected", "1 while connected to MRL.", lambda: int(self.connected))
+        metrics.gauge(f"{prefix}ws_outbound_queue", "Messages waiting to be sent to MRL.", lambda: len(self.outbound))
+        metrics.counter(f"{prefix}ws_connects_total", "Successful connections to MRL.", lambda: self.connects)
+        metrics.counter(f"{prefix}ws_sent_total", "Messages sent to MRL.", lambda: self.sent)
+        metrics.counter(f"{prefix}ws_dropped_total", "Outbound messages dropped because the queue was full or they couldn't be sent.", lambda: self.dropped)
+
+    def uptime(self):
+        """ Seconds connected so far, and the fraction of time since start that was connected. """
+        connected = self.connected_time + (time.monotonic() - self.connected_at if self.connected_at else 0.0)
+        return connected, connected / max(time.monotonic() - self.started, 1e-9)
+
+    def stats(self):
+        connected, ratio = self.uptime()
+        return {
+            "connected": self.connected,
+            "session_uptime_s": round(time.monotonic() - self.connected_at, 1) if self.connected_at else 0.0,
+            "uptime_s": round(connected, 1),
+            "uptime_ratio": round(ratio, 3),
+            "connects": self.connects,
+            "failed_connects": self.failures,
+            "connect_latency_ms": None if self.connect_latency is None else round(self.connect_latency * 1000, 1),
+            "queued": len(self.outbound),
+            "sent": self.sent,
+            "coalesced": self.coalesced,
+            "dropped": self.dropped,
+        }
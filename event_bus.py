@@ -0,0 +1,87 @@
+# event_bus.py
+import asyncio
+import inspect
+from collections import defaultdict
+from logger import get_logger
+
+log = get_logger(__name__)
+
+ANY = "*"
+
+
+class Subscription:
+    def __init__(self, method, handler, sender=None, background=False):
+        self.method = method
+        self.handler = handler
+        self.sender = sender
+        self.background = background
+        self.is_async = inspect.iscoroutinefunction(handler)
+
+
+class EventBus:
+    """
+    Dispatches MRL messages to handlers registered per method.
+
+    - Lookup is a single dict access on `msg["method"]`; handlers for `ANY` ("*") see every message.
+    - `sender` restricts a handler to messages whose sender contains that text (e.g. "htmlFilter").
+    - `async def` handlers run as tasks; sync handlers with `background=True` run on a worker
+      thread. Neither blocks the receive loop or the other handlers.
+    - A failing handler is logged and doesn't affect the others.
+
+    Can be used as a decorator:
+
+        @BUS.subscribe("onUtterance")
+        def on_utterance(msg): ...
+    """
+
+    def __init__(self):
+        self.handlers = defaultdict(list)
+        self.tasks = set()
+
+    def subscribe(self, method, handler=None, sender=None, background=False):
+        if handler is None:
+            return lambda fn: self.subscribe(method, fn, sender, background)
+        self.handlers[method].append(Subscription(method, handler, sender, background))
+        return handler
+
+    def unsubscribe(self, method, handler):
+        self.handlers[method] = [s for s in self.handlers[method] if s.handler is not handler]
+
+    def dispatch(self, msg):
+        """ Calls every handler registered for the message's method (and `ANY`). """
+        method = msg.get("method")
+        subscriptions = self.handlers.get(method, [])
+        if ANY in self.handlers:
+            subscriptions = subscriptions + self.handlers[ANY]
+
+        for subscription in subscriptions:
+            if subscription.sender and subscription.sender not in (msg.get("sender") or ""):
+                continue
+            try:
+                self._call(subscription, msg)
+            except Exception:
+                log.exception(f"Handler {subscription.handler.__name__} failed for {method}")
+
+    def _call(self, subscription, msg):
+        if subscription.is_async:
+            self._track(asyncio.ensure_future(subscription.handler(msg)), subscription)
+        elif subscription.background:
+            loop = asyncio.get_running_loop()
+            self._track(loop.run_in_executor(None, subscription.handler, msg), subscription)
+        else:
+            subscription.handler(msg)
+
+    def _track(self, future, subscription):
+        # Keep a reference until done so the task isn't garbage collected, and log failures
+        self.tasks.add(future)
+
+        def done(f):
+            self.tasks.discard(f)
+            if not f.cancelled() and f.exception():
+                log.error(f"Handler {subscription.handler.__name__} failed for {subscription.method}: {f.exception()}")
+
+        future.add_done_callback(done)
+
+
+# Shared bus: robot behaviors subscribe here without touching the receive loop
+BUS = EventBus()
@@ -0,0 +1,136 @@
+# frame_parser.py
+import json
+
+# Optional faster JSON backends, used for non-frame messages and the slow path
+try:
+    import orjson
+    loads = orjson.loads
+    JSON_BACKEND = "orjson"
+except ImportError:
+    try:
+        import simdjson
+        loads = simdjson.loads
+        JSON_BACKEND = "simdjson"
+    except ImportError:
+        loads = json.loads
+        JSON_BACKEND = "json"
+
+
+METHOD_KEY = b'"method"'
+MSG_ID_KEY = b'"msgId"'
+BASE64_MARKER = b"base64,"
+# "name" inside the escaped inner JSON of an onWebDisplay message: the display source
+SOURCE_KEY = b'\\"name\\"'
+ESCAPED_QUOTE = b'\\"'
+WEB_DISPLAY = "onWebDisplay"
+
+
+def _as_bytes(message):
+    return message.encode("utf-8") if isinstance(message, str) else message
+
+
+def get_method(message):
+    """
+    Returns the value of the top-level "method" field without parsing the whole message.
+    Works on the raw bytes (or str) received from MRL. Returns None if it can't be found.
+    """
+    data = _as_bytes(message)
+    key = data.find(METHOD_KEY)
+    if key < 0:
+        return None
+
+    # Skip `:` and whitespace up to the opening quote of the value
+    start = data.find(b'"', key + len(METHOD_KEY))
+    if start < 0 or data[key + len(METHOD_KEY):start].strip(b" \t\r\n:"):
+        return None
+    end = data.find(b'"', start + 1)
+    if end < 0:
+        return None
+    return data[start + 1:end].decode("utf-8")
+
+
+def get_msg_id(message, limit=None):
+    """
+    Returns the top-level numeric "msgId" of an MRL message (its send time in ms since
+    the epoch), found without parsing the message. Returns None if it has none.
+    MRL serializes `msgId` first, so `limit` can keep the search out of a frame payload.
+    """
+    data = _as_bytes(message)
+    key = data.find(MSG_ID_KEY, 0, limit)
+    if key < 0:
+        return None
+    start = key + len(MSG_ID_KEY)
+    # Skip `:` and whitespace, then read the digits
+    while start < len(data) and data[start] in b" \t\r\n:":
+        start += 1
+    end = start
+    while end < len(data) and 0x30 <= data[end] <= 0x39:
+        end += 1
+    return int(data[start:end]) if end > start else None
+
+
+def get_frame_source(message):
+    """
+    Returns the source (e.g. "i01.left") of an `onWebDisplay` frame without parsing the
+    message: the "name" of the WebDisplay object in the escaped inner JSON. None if absent.
+    """
+    data = _as_bytes(message)
+    key = data.find(SOURCE_KEY)
+    if key < 0:
+        return None
+    start = data.find(ESCAPED_QUOTE, key + len(SOURCE_KEY))
+    if start < 0 or data[key + len(SOURCE_KEY):start].strip(b" \t\r\n:"):
+        return None
+    start += len(ESCAPED_QUOTE)
+    end = data.find(ESCAPED_QUOTE, start)
+    return data[start:end].decode("utf-8") if end >= 0 else None
+
+
+def _parse_frame(message):
+    """ Slow path: full double JSON decode, same as the original handler. """
+    msg = loads(message)
+    frame_data = loads(msg.get("data")[0]).get("data")
+    return frame_data[frame_data.index(",") + 1:] if frame_data.startswith("data:") else frame_data
+
+
+def frame_span(message):
+    """
+    Returns `(start, end)` of the base64 JPEG payload inside a raw `onWebDisplay`
+    message, or None if it can't be sliced out directly (missing, or containing JSON escapes).
+    """
+    data = _as_bytes(message)
+    marker = data.find(BASE64_MARKER)
+    if marker < 0:
+        return None
+
+    start = marker + len(BASE64_MARKER)
+    end = data.find(b'"', start)
+    if end < 0:
+        return None
+
+    # The payload sits inside an escaped inner JSON string, so it ends with `\"`
+    if data[end - 1] == 0x5C:
+        end -= 1
+
+    if data.find(b"\\", start, end) >= 0:
+        # Escaped characters (e.g. `\/` or `\u003d`) - let the JSON decoder handle them
+        return None
+    return start, end
+
+
+def extract_frame(message):
+    """
+    Extracts the base64 JPEG payload from an `onWebDisplay` message.
+
+    Instead of decoding the outer and inner JSON and stripping the data URL prefix, the
+    base64 span is located with a couple of `find` calls and returned as a memoryview
+    over the received message, so no copy is made until the base64 decode itself. Falls
+    back to the full parse if the span contains JSON escapes.
+
+    Returns a bytes-like base64 payload (or a str from the slow path), or None.
+    """
+    data = _as_bytes(message)
+    span = frame_span(data)
+    if span is None:
+        return _parse_frame(message)
+    return memoryview(data)[span[0]:span[1]]
@@ -0,0 +1,52 @@
+# frame_pool.py
+import threading
+import numpy as np
+from config import FRAME_WIDTH, FRAME_HEIGHT
+
+
+class FrameBuffers:
+    """
+    Preallocated arrays for one frame, filled in place by `decode_frame`.
+    - `resized`: the decoded frame scaled to FRAME_WIDTH x FRAME_HEIGHT (scratch).
+    - `bgr`: the mirrored frame in BGR, fed to YOLO.
+    - `rgb`: the same frame converted once to RGB, fed to Mediapipe and drawn on for display.
+    - `trace`: the `metrics.FrameTrace` of the frame currently in the buffers, if traced.
+    """
+
+    def __init__(self, width=FRAME_WIDTH, height=FRAME_HEIGHT):
+        shape = (height, width, 3)
+        self.resized = np.empty(shape, dtype=np.uint8)
+        self.bgr = np.empty(shape, dtype=np.uint8)
+        self.rgb = np.empty(shape, dtype=np.uint8)
+        self.trace = None
+
+
+class FrameBufferPool:
+    """
+    Free list of `FrameBuffers`, shared by the pipeline stages.
+
+    A frame's buffers are acquired by the decode stage and released once the frame has
+    been rendered or dropped, so a buffer is never overwritten while another stage still
+    reads it. The pool only allocates when every set is in use, so after warm-up the
+    per-frame allocation rate is near zero.
+    """
+
+    def __init__(self, width=FRAME_WIDTH, height=FRAME_HEIGHT, size=3):
+        self.width = width
+        self.height = height
+        self.lock = threading.Lock()
+        self.free = [FrameBuffers(width, height) for _ in range(size)]
+        self.allocated = size
+
+    def acquire(self):
+        with self.lock:
+            if self.free:
+                return self.free.pop()
+            self.allocated += 1
+        return FrameBuffers(self.width, self.height)
+
+    def release(self, buffers):
+        if buffers is None:
+            return
+        with self.lock:
+            self.free.append(buffers)
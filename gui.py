@@ -1,8 +1,16 @@
 # gui.py
 import tkinter as tk
 import asyncio
+import time
+import cv2
+import numpy as np
 from PIL import Image, ImageTk
 from websocket_handler import publish_message
+from metrics import METRICS
+from config import DISPLAY_FPS, GUI_PUMP_INTERVAL, METRICS_OVERLAY
+from logger import get_logger
+
+log = get_logger(__name__)
 
 def update_video_feed(video_label, image):
     """ Updates the video feed in the GUI. """
@@ -27,30 +35,38 @@ def run_publish_button(action, user_input_box):
     """ Runs the publish function asynchronously. """
     user_text = user_input_box.get().strip()
     if not user_text and action in ["say", "ask", "llm"]:
-        print("No text entered.")
+        log.warning("No text entered.")
         return
     asyncio.create_task(publish_message(action, user_text))
 
+def hand_status(hand_detected, raised_hand):
+    """ Text and color of the hand label. """
+    if raised_hand:
+        return "Raised Hand Detected ✅", "green"
+    if hand_detected:
+        return "Hand Detected ✋", "orange"
+    return "No Hand ❌", "red"
+
+def face_status(face_detected, is_smiling, is_sad):
+    """ Text and color of the face label. """
+    if is_smiling:
+        return "Smiling Face 😊", "green"
+    if is_sad:
+        return "Sad Face 😞", "blue"
+    if face_detected:
+        return "Face Detected 😐", "orange"
+    return "No Face ❌", "red"
+
 def update_video_feed(video_label, image, detections, face_detected, is_smiling, is_sad, hand_detected, raised_hand, raised_hand_label, face_label):
     """ Updates the video feed and GUI labels. """
 
     # ✅ GUI Updates for Hand Detection
-    if raised_hand:
-        raised_hand_label.config(text="Raised Hand Detected ✅", fg="green")
-    elif hand_detected:
-        raised_hand_label.config(text="Hand Detected ✋", fg="orange")
-    else:
-        raised_hand_label.config(text="No Hand ❌", fg="red")
+    text, color = hand_status(hand_detected, raised_hand)
+    raised_hand_label.config(text=text, fg=color)
 
     # ✅ GUI Updates for Face Detection
-    if is_smiling:
-        face_label.config(text="Smiling Face 😊", fg="green")
-    elif is_sad:
-        face_label.config(text="Sad Face 😞", fg="blue")
-    elif face_detected:
-        face_label.config(text="Face Detected 😐", fg="orange")
-    else:
-        face_label.config(text="No Face ❌", fg="red")
+    text, color = face_status(face_detected, is_smiling, is_sad)
+    face_label.config(text=text, fg=color)
 
     # ✅ Convert Image for Tkinter Display
     image = Image.fromarray(image)
@@ -58,6 +74,129 @@ def update_video_feed(video_label, image, detections, face_detected, is_smiling,
     video_label.imgtk = imgtk
     video_label.configure(image=imgtk)
 
+class GuiRenderer:
+    """
+    Coalescing, frame-rate capped renderer for the Tk widgets.
+
+    The `update_*` methods have the same signatures as the module-level functions but only
+    record the latest state; `tick()` applies it at most `fps` times per second. Frames
+    that arrive between ticks replace each other, the PhotoImage is created once and then
+    refreshed with `paste()`, and labels/listboxes are only touched when their content
+    actually changes, so Tk can't become the bottleneck or starve the network.
+
+    With `overlay`, the rolling frame latencies and drop counts are drawn onto the video.
+    """
+
+    def __init__(self, fps=DISPLAY_FPS, overlay=METRICS_OVERLAY):
+        self.interval = 1.0 / fps
+        self.last_tick = 0.0
+        self.frame = None          # Display copy of the latest frame, reused between frames
+        self.frame_pending = False
+        self.frame_since = 0.0     # When the pending frame arrived, for the display wait
+        self.overlay = overlay
+        self.imgtk = None
+        self.pending = {}          # widget -> latest state to apply
+        self.applied = {}          # widget -> state currently shown
+        self.responses = []        # (listbox, text) to append
+        self.frames_rendered = 0
+
+    def update_video_feed(self, video_label, image, detections, face_detected, is_smiling, is_sad, hand_detected, raised_hand, raised_hand_label, face_label):
+        # Copy into our own buffer: the pipeline reuses its frame buffers after this returns
+        if self.frame is None or self.frame.shape != image.shape:
+            self.frame = np.empty_like(image)
+        np.copyto(self.frame, image)
+        if not self.frame_pending:
+            self.frame_since = time.perf_counter()
+        self.frame_pending = True
+        self.video_label = video_label
+        self.pending[raised_hand_label] = hand_status(hand_detected, raised_hand)
+        self.pending[face_label] = face_status(face_detected, is_smiling, is_sad)
+
+    def update_detected_items(self, detected_items_listbox, detected_items):
+        self.pending[detected_items_listbox] = tuple(detected_items)
+
+    def update_response_listbox(self, response_listbox, text):
+        self.responses.append((response_listbox, text))
+
+    def due(self, now):
+        return now - self.last_tick >= self.interval
+
+    def tick(self, now=None):
+        """ Applies the pending state to the widgets. Returns False if it isn't time yet. """
+        now = time.monotonic() if now is None else now
+        if not self.due(now):
+            return False
+        self.last_tick = now
+
+        if self.frame_pending:
+            self._render_frame()
+
+        for widget, state in self.pending.items():
+            if self.applied.get(widget) != state:
+                self.applied[widget] = state
+                if isinstance(widget, tk.Listbox):
+                    widget.delete(0, tk.END)
+                    widget.insert(tk.END, *state)
+                else:
+                    text, color = state
+                    widget.config(text=text, fg=color)
+        self.pending.clear()
+
+        if self.responses:
+            for listbox, text in self.responses:
+                listbox.insert(tk.END, text)
+            for listbox in {listbox for listbox, _ in self.responses}:
+                listbox.yview(tk.END)
+            self.responses.clear()
+        return True
+
+    def _render_frame(self):
+        start = time.perf_counter()
+        if self.overlay:
+            self._draw_overlay()
+        height, width = self.frame.shape[:2]
+        # Wraps our buffer without copying it; paste() copies straight into the Tk image
+        image = Image.frombuffer("RGB", (width, height), self.frame, "raw", "RGB", 0, 1)
+        if self.imgtk is None or (self.imgtk.width(), self.imgtk.height()) != (width, height):
+            self.imgtk = ImageTk.PhotoImage(image=image)
+            self.video_label.imgtk = self.imgtk
+            self.video_label.configure(image=self.imgtk)
+        else:
+            self.imgtk.paste(image)
+        self.frame_pending = False
+        self.frames_rendered += 1
+        METRICS.observe("display_wait", start - self.frame_since)
+        METRICS.observe("display", time.perf_counter() - start)
+
+    def _draw_overlay(self):
+        summary = METRICS.summary()
+        lines = []
+        for stage in ("total", "decode", "infer", "network"):
+            if stage in summary:
+                p50, p95 = summary[stage]
+                lines.append(f"{stage} p50 {p50:.0f} / p95 {p95:.0f} ms")
+        dropped = (summary.get("frames_dropped_decode_total") or 0) + (summary.get("frames_dropped_infer_total") or 0)
+        lines.append(f"fps {summary.get('processed_fps') or 0:.1f}/{summary.get('incoming_fps') or 0:.1f}  dropped {dropped}")
+        for i, line in enumerate(lines):
+            cv2.putText(self.frame, line, (10, 20 + 18 * i), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 0), 1, cv2.LINE_AA)
+
+async def run_gui_loop(root, renderer, on_tick=None):
+    """ Pumps Tk input events and renders at the renderer's capped frame rate. """
+    while True:
+        if renderer.tick() and on_tick:
+            on_tick()
+        root.update()
+        await asyncio.sleep(GUI_PUMP_INTERVAL)  # Allow asyncio to run
+
+MODEL_STATE_ICONS = {"pending": "⏳", "loading": "⏳", "ready": "✅", "failed": "❌"}
+
+def update_model_status(model_status_label, states):
+    """ Shows the loading state of each model, e.g. "yolo ✅  face_mesh ⏳  hands ⏳". """
+    text = "Models: " + "  ".join(f"{name} {MODEL_STATE_ICONS.get(state, state)}" for name, state in states.items())
+    if model_status_label.cget("text") != text:
+        color = "green" if all(state == "ready" for state in states.values()) else "orange"
+        model_status_label.config(text=text, fg=color)
+
 def start_gui():
     """ Sets up and starts the Tkinter GUI. """
     root = tk.Tk()
@@ -75,6 +214,9 @@ def start_gui():
     face_label = tk.Label(frame_lists, text="No Face ❌", font=("Arial", 14), fg="red")
     face_label.grid(row=0, column=1)
 
+    model_status_label = tk.Label(frame_lists, text="Models: loading ⏳", font=("Arial", 10), fg="orange")
+    model_status_label.grid(row=1, column=0, columnspan=2)
+
     response_label = tk.Label(root, text="Responses", font=("Arial", 12, "bold"))
     response_label.grid(row=2, column=1, padx=10, pady=5)
 
@@ -95,7 +237,7 @@ def start_gui():
 
     buttons = [
         ("Say", "say"), ("Ask", "ask"), ("LLM", "llm"),
-        ("Start Recording", "start"), ("Stop Recording", "stop"),("Ask LLM", "askllm")
+        ("Start Recording", "start"), ("Stop Recording", "stop"),("Ask LLM", "askllm"), ("Ask Vision", "askvision"), ("Stop LLM", "stopllm"), ("New Chat", "resetllm")
     ]
 
     for i, (label, action) in enumerate(buttons):
@@ -103,5 +245,8 @@ def start_gui():
 
     root.protocol("WM_DELETE_WINDOW", root.quit)
 
+    # ✅ Widget updates go through the throttled renderer
+    renderer = GuiRenderer()
+
     # ✅ Return GUI + update functions
-    return root, video_label, detected_items_listbox, response_listbox, raised_hand_label, face_label, update_video_feed, update_detected_items, update_response_listbox
\ No newline at end of file
+    return root, video_label, detected_items_listbox, response_listbox, raised_hand_label, face_label, renderer.update_video_feed, renderer.update_detected_items, renderer.update_response_listbox, model_status_label, renderer
\ No newline at end of file
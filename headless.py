@@ -0,0 +1,294 @@
+# headless.py
+"""
+Headless mode: runs the vision pipeline without Tk and publishes what it sees.
+
+    python headless.py [--jsonl events.jsonl | --jsonl -] [--mjpeg] [--port 8765]
+
+One pipeline serves every consumer: each event is serialized once and each annotated
+frame JPEG-encoded once, however many clients are connected.
+
+- ws://HOST:PORT/events   one JSON event per message: {"type": "frame", ...} for every
+                          processed frame (detections, face, hands), {"type": "vision", ...}
+                          when something changes (e.g. "entered", "hand_raised", see
+                          tracking.py) and {"type": "chat", ...} for speech/chatbot/LLM
+                          events. Clients can send commands like
+                          {"type": "say", "text": "Hello"} (any `publish_message` type).
+- http://HOST:PORT/video.mjpg   annotated frames as MJPEG (with --mjpeg); `?stream=NAME` picks
+                                one of config.STREAMS, the primary stream by default
+- --jsonl PATH                  the same events as JSON lines, "-" for stdout
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+import cv2
+import numpy as np
+from aiohttp import web, WSMsgType
+from config import (HEADLESS_HOST, HEADLESS_PORT, HEADLESS_CLIENT_QUEUE, MJPEG_FPS, MJPEG_QUALITY,
+                    METRICS_HOST, METRICS_PORT, STREAMS)
+from event_bus import BUS
+from logger import get_logger, set_stream
+from metrics import METRICS, start_metrics_server
+from models import MODELS
+from mrl_registry import REGISTRY
+from ollama import OLLAMA
+from websocket_handler import run_client, publish_message, message_data
+
+log = get_logger(__name__)
+
+# MRL/LLM events forwarded to consumers as {"type": "chat"} events
+CHAT_EVENTS = ("onUtterance", "onResponse", "onRequest", "onLlmText", "onCachedResponse")
+# Commands consumers may send, same as the GUI's buttons
+COMMANDS = ("say", "ask", "llm", "start", "stop", "askllm", "askvision", "stopllm", "resetllm")
+
+
+def frame_event(frame_id, result):
+    """ The consumer-facing view of a `pipeline.infer_frame` result. """
+    return {
+        "type": "frame",
+        "stream": result["stream"],
+        "frame_id": frame_id,
+        "time": time.time(),
+        "detections": [
+            {"label": det["label"], "confidence": round(det["confidence"], 3), "bbox": list(det["bbox"]), "track_id": det.get("track_id")}
+            for det in result["detections"]
+        ],
+        "face": {"detected": result["face_detected"], "smiling": result["is_smiling"], "sad": result["is_sad"]},
+        "hands": {"detected": result["hand_detected"], "raised": result["raised_hand"]},
+    }
+
+
+class EventHub:
+    """
+    Fans events out to WebSocket clients and an optional JSON lines file.
+    Each client has a bounded queue: a client that can't keep up loses its oldest events
+    instead of slowing down the pipeline or the other clients.
+    """
+
+    def __init__(self, jsonl=None, queue_size=HEADLESS_CLIENT_QUEUE):
+        self.jsonl = jsonl
+        self.queue_size = queue_size
+        self.clients = set()
+        self.published = 0
+        self.dropped = 0
+
+    def publish(self, event):
+        line = json.dumps(event)
+        self.published += 1
+        if self.jsonl:
+            self.jsonl.write(line + "\n")
+        for queue in self.clients:
+            if queue.full():
+                queue.get_nowait()
+                self.dropped += 1
+            queue.put_nowait(line)
+
+    def subscribe(self):
+        queue = asyncio.Queue(self.queue_size)
+        self.clients.add(queue)
+        return queue
+
+    def unsubscribe(self, queue):
+        self.clients.discard(queue)
+
+
+class MjpegStream:
+    """
+    Shares annotated frames as JPEG with every MJPEG client.
+
+    Frames are only encoded while someone is watching, at most `fps` times per second,
+    on a worker thread; a frame that arrives while the previous one is still being
+    encoded is skipped.
+    """
+
+    def __init__(self, fps=MJPEG_FPS, quality=MJPEG_QUALITY):
+        self.interval = 1.0 / fps
+        self.quality = quality
+        self.bgr = None
+        self.jpeg = None
+        self.frame_id = 0
+        self.clients = 0
+        self.encoding = False
+        self.last_update = 0.0
+        self.condition = asyncio.Condition()
+        self.task = None
+
+    def update(self, rgb):
+        """ Called with each annotated RGB frame; only valid during the call, so it's converted (copied) here. """
+        now = time.monotonic()
+        if not self.clients or self.encoding or now - self.last_update < self.interval:
+            return
+        self.last_update = now
+        self.encoding = True
+        if self.bgr is None or self.bgr.shape != rgb.shape:
+            self.bgr = np.empty_like(rgb)
+        cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR, dst=self.bgr)
+        self.task = asyncio.ensure_future(self._encode())
+
+    async def _encode(self):
+        try:
+            ok, jpeg = await asyncio.to_thread(cv2.imencode, ".jpg", self.bgr, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+            if ok:
+                self.jpeg = jpeg.tobytes()
+                self.frame_id += 1
+                async with self.condition:
+                    self.condition.notify_all()
+        finally:
+            self.encoding = False
+
+    async def frames(self):
+        """ Yields every new JPEG for one client. """
+        self.clients += 1
+        try:
+            last = self.frame_id
+            while True:
+                async with self.condition:
+                    await self.condition.wait_for(lambda: self.frame_id != last)
+                last = self.frame_id
+                yield self.jpeg
+        finally:
+            self.clients -= 1
+
+
+class HeadlessServer:
+    """ Serves the `EventHub` over WebSocket and the streams' `MjpegStream`s (by name) over HTTP. """
+
+    def __init__(self, hub, mjpeg=None):
+        self.hub = hub
+        self.mjpeg = mjpeg
+
+    def app(self):
+        app = web.Application()
+        app.router.add_get("/events", self.events)
+        if self.mjpeg:
+            app.router.add_get("/video.mjpg", self.video)
+        return app
+
+    async def events(self, request):
+        ws = web.WebSocketResponse(heartbeat=30)
+        await ws.prepare(request)
+        queue = self.hub.subscribe()
+        sender = asyncio.create_task(self._send(ws, queue))
+        try:
+            async for msg in ws:
+                if msg.type == WSMsgType.TEXT:
+                    await self._command(msg.data)
+        finally:
+            sender.cancel()
+            self.hub.unsubscribe(queue)
+        return ws
+
+    async def _send(self, ws, queue):
+        while not ws.closed:
+            await ws.send_str(await queue.get())
+
+    async def _command(self, data):
+        try:
+            command = json.loads(data)
+        except ValueError:
+            log.warning(f"Invalid command: {data}")
+            return
+        if command.get("type") not in COMMANDS:
+            log.warning(f"Unknown command: {data}")
+            return
+        await publish_message(command["type"], command.get("text", ""))
+
+    async def video(self, request):
+        stream = self.mjpeg.get(request.query.get("stream", next(iter(self.mjpeg))))
+        if stream is None:
+            raise web.HTTPNotFound(text=f"Unknown stream, expected one of: {', '.join(self.mjpeg)}")
+        response = web.StreamResponse(headers={
+            "Content-Type": "multipart/x-mixed-replace; boundary=frame",
+            "Cache-Control": "no-cache",
+        })
+        await response.prepare(request)
+        try:
+            async for jpeg in stream.frames():
+                await response.write(b"--frame\r\nContent-Type: image/jpeg\r\nContent-Length: %d\r\n\r\n" % len(jpeg))
+                await response.write(jpeg + b"\r\n")
+        except ConnectionResetError:
+            pass
+        return response
+
+
+def claim_stdout():
+    """
+    Keeps stdout for the JSON lines and sends everything else to stderr: our logs, prints and
+    libraries writing to `sys.stdout` or straight to file descriptor 1 (e.g. ultralytics'
+    download and export progress). Returns the (line buffered) file to write events to.
+    """
+    sys.stdout.flush()
+    jsonl = os.fdopen(os.dup(sys.stdout.fileno()), "w", buffering=1, encoding="utf-8")
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    sys.stdout = sys.stderr
+    set_stream(sys.stderr)
+    return jsonl
+
+
+async def main(args):
+    """ Starts the models, the consumer endpoints and the MRL client. """
+    jsonl = None
+    if args.jsonl == "-":
+        # Before anything (e.g. the model loaders) can log
+        jsonl = claim_stdout()
+    elif args.jsonl:
+        jsonl = open(args.jsonl, "a", buffering=1, encoding="utf-8")
+
+    MODELS.start()
+
+    hub = EventHub(jsonl)
+    mjpeg = {name: MjpegStream() for name in STREAMS} if args.mjpeg else None
+    frame_id = 0
+
+    def render(result):
+        nonlocal frame_id
+        frame_id += 1
+        hub.publish(frame_event(frame_id, result))
+        if mjpeg:
+            mjpeg[result["stream"]].update(result["image"])
+
+    def on_chat(msg):
+        hub.publish({"type": "chat", "method": msg.get("method"), "sender": msg.get("sender"), "data": message_data(msg)})
+
+    def on_vision(msg):
+        hub.publish({"type": "vision", "stream": msg.get("sender"), "time": time.time(), **message_data(msg)})
+
+    for method in CHAT_EVENTS:
+        BUS.subscribe(method, on_chat)
+    BUS.subscribe("onVisionEvent", on_vision)
+
+    METRICS.gauge("event_clients", "Connected event WebSocket clients.", lambda: len(hub.clients))
+    METRICS.counter("events_dropped_total", "Events dropped for clients that couldn't keep up.", lambda: hub.dropped)
+    if mjpeg:
+        METRICS.gauge("mjpeg_clients", "Connected MJPEG clients.", lambda: sum(stream.clients for stream in mjpeg.values()))
+
+    runner = web.AppRunner(HeadlessServer(hub, mjpeg).app(), access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, args.host, args.port).start()
+    log.info(f"Events on ws://{args.host}:{args.port}/events" + (f", video on http://{args.host}:{args.port}/video.mjpg" if mjpeg else ""))
+
+    if METRICS_PORT:
+        await start_metrics_server(METRICS, METRICS_HOST, METRICS_PORT)
+
+    try:
+        await run_client(render)
+    finally:
+        await runner.cleanup()
+        await OLLAMA.close()
+        await REGISTRY.close()
+        if jsonl:
+            jsonl.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default=HEADLESS_HOST)
+    parser.add_argument("--port", type=int, default=HEADLESS_PORT)
+    parser.add_argument("--jsonl", help="Also append events to this file ('-' for stdout)")
+    parser.add_argument("--mjpeg", action="store_true", help="Serve annotated frames on /video.mjpg")
+    try:
+        asyncio.run(main(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,119 @@
+# inference.py
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError
+from config import YOLO_BATCH_WINDOW, YOLO_MAX_BATCH, INFERENCE_WORKERS
+from models import MODELS, load_face_mesh, load_hands
+from scheduler import create_default_scheduler
+from yolo_backends import boxes_to_detections
+
+
+class YoloBatcher:
+    """
+    Runs YOLO for every video stream in shared batches.
+
+    `predict(bgr)` is called from each stream's YOLO detector thread and blocks until its
+    result is ready. A worker thread collects the waiting frames into one `predict_batch`
+    call: it waits up to `window` seconds for the other streams to catch up, so a batch
+    normally holds one frame per stream. Each stream has at most one frame waiting (its
+    detector runs one frame at a time), and frames are served in arrival order, so no
+    stream can starve another.
+
+    A batch that fails fails every caller in it, and a caller never waits on a worker
+    thread that isn't running.
+    """
+
+    def __init__(self, model="yolo", max_batch=YOLO_MAX_BATCH, window=YOLO_BATCH_WINDOW):
+        self.model = model
+        self.max_batch = max_batch
+        self.window = window
+        self.streams = 1
+        self.pending = []  # (image, future)
+        self.condition = threading.Condition()
+        self.thread = None
+        self.batches = 0
+        self.frames = 0
+
+    def predict(self, image):
+        if MODELS.get(self.model) is None:
+            return []  # Still loading
+        future = Future()
+        with self.condition:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self._run, name="yolo-batcher", daemon=True)
+                self.thread.start()
+            self.pending.append((image, future))
+            self.condition.notify_all()
+        while True:
+            try:
+                return future.result(timeout=1.0)
+            except TimeoutError:
+                if not self.thread.is_alive() and not future.done():
+                    raise RuntimeError("YOLO batcher stopped")
+
+    def _run(self):
+        while True:
+            with self.condition:
+                self.condition.wait_for(lambda: self.pending)
+                # Give the other streams a moment to join the batch
+                deadline = time.monotonic() + self.window
+                while len(self.pending) < min(self.streams, self.max_batch):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self.condition.wait(remaining)
+                batch, self.pending = self.pending[:self.max_batch], self.pending[self.max_batch:]
+
+            try:
+                model = MODELS.get(self.model)
+                outputs = model.predict_batch([image for image, _ in batch])
+                results = [boxes_to_detections(*output, model.names) for output in outputs]
+                if len(results) != len(batch):
+                    raise ValueError(f"{len(results)} YOLO results for {len(batch)} frames")
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            self.batches += 1
+            self.frames += len(batch)
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+
+    def stats(self):
+        return {"batches": self.batches, "avg_batch": round(self.frames / self.batches, 2) if self.batches else 0.0}
+
+
+def stream_model(name, stream, primary):
+    """ Name of a stream's own Mediapipe graph in `MODELS`; the primary stream keeps the plain name. """
+    return name if stream == primary else f"{name}:{stream}"
+
+
+class InferencePool:
+    """
+    Inference shared by every video stream (camera or robot) in the process.
+
+    - One detector thread pool for all streams' schedulers, instead of one per stream.
+    - YOLO (one model, stateless) runs through a `YoloBatcher`, so frames from different
+      streams share one inference.
+    - The Mediapipe face mesh and hand graphs track state from frame to frame, so every
+      stream gets its own, loaded in the background like the other models.
+    """
+
+    def __init__(self, streams, max_workers=INFERENCE_WORKERS):
+        self.streams = list(streams)
+        self.primary = self.streams[0]
+        # Blocked YOLO callers hold a thread while waiting for their batch: 3 per stream never starves
+        self.executor = ThreadPoolExecutor(max_workers=max_workers or 3 * len(self.streams), thread_name_prefix="detector")
+        self.yolo = YoloBatcher()
+        self.yolo.streams = len(self.streams)
+
+    def create_scheduler(self, stream):
+        """ The YOLO / face mesh / hand tracking scheduler of one stream, see `scheduler.create_default_scheduler`. """
+        face_model = stream_model("face_mesh", stream, self.primary)
+        hands_model = stream_model("hands", stream, self.primary)
+        MODELS.register(face_model, load_face_mesh)
+        MODELS.register(hands_model, load_hands)
+        return create_default_scheduler(self.yolo.predict, face_model, hands_model, self.executor)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,45 @@
+# logger.py
+import atexit
+import logging
+import queue
+import sys
+from logging.handlers import QueueHandler, QueueListener
+from config import LOG_LEVEL
+
+ROOT = "inmoov"
+_listener = None
+
+
+def _setup():
+    """
+    Routes all `inmoov.*` loggers through a queue: the calling thread (e.g. the WebSocket
+    receive loop) only enqueues the record, a background thread formats and writes it.
+    """
+    global _listener
+    log_queue = queue.SimpleQueue()
+    stream = logging.StreamHandler(sys.stdout)
+    stream.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s", "%H:%M:%S"))
+
+    root = logging.getLogger(ROOT)
+    root.setLevel(LOG_LEVEL)
+    root.addHandler(QueueHandler(log_queue))
+    root.propagate = False
+
+    _listener = QueueListener(log_queue, stream)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+
+def set_stream(stream):
+    """ Redirects the log output, e.g. to stderr when stdout carries data. """
+    if _listener is None:
+        _setup()
+    for handler in _listener.handlers:
+        handler.setStream(stream)
+
+
+def get_logger(name):
+    """ Returns a buffered logger, e.g. `log = get_logger(__name__)`. """
+    if _listener is None:
+        _setup()
+    return logging.getLogger(f"{ROOT}.{name}")
@@ -1,12 +1,43 @@
 # main.py
 import asyncio
-from gui import start_gui
+from models import MODELS, mark_phase
+from gui import start_gui, update_model_status, run_gui_loop
 from websocket_handler import subscribe_to_channel
-from mrl_models import get_inmoov2_instance
+from mrl_registry import REGISTRY
+from ollama import OLLAMA
+from metrics import METRICS, start_metrics_server
+from config import METRICS_HOST, METRICS_PORT
+from logger import get_logger
+
+log = get_logger(__name__)
+
+async def print_inmoov_info():
+    """ Fetches the InMoov2 service and its peers (concurrently) without blocking startup. """
+    try:
+        inmoov = await REGISTRY.get_inmoov2()
+        peers = await REGISTRY.get_peers()
+    except Exception as e:
+        log.warning(f"Couldn't fetch InMoov2 service: {e}")
+        return
+    mark_phase("InMoov2 service fetched")
+    log.info(f"InMoov2 Service Name: {inmoov.name}")
+    log.info(f"Running Status: {inmoov.isRunning}")
+    log.info(f"Number of Peers: {len(inmoov.config.peers)} ({sum(1 for p in peers.values() if p and p.isRunning)} running)")
+    log.info(f"List of Gestures: {', '.join(inmoov.get_gestures())}")
 
 async def main():
     """ Main function to run both the Tkinter GUI and the WebSocket communication. """
-    root, video_label, detected_items_listbox, response_listbox, raised_hand_label, face_label, update_video_feed, update_detected_items, update_response_listbox = start_gui()
+    # ✅ YOLO & Mediapipe load in the background, detection starts as each one is ready
+    MODELS.start()
+
+    root, video_label, detected_items_listbox, response_listbox, raised_hand_label, face_label, update_video_feed, update_detected_items, update_response_listbox, model_status_label, renderer = start_gui()
+    mark_phase("GUI ready")
+
+    asyncio.create_task(print_inmoov_info())
+
+    # ✅ Per-frame stage latencies, queue depths and drops for Prometheus
+    if METRICS_PORT:
+        await start_metrics_server(METRICS, METRICS_HOST, METRICS_PORT)
 
     # ✅ Now correctly passing function references
     asyncio.create_task(subscribe_to_channel(
@@ -21,19 +52,11 @@ async def main():
     ))
 
     # Keep Tkinter running in the asyncio event loop
-    while True:
-        root.update_idletasks()
-        root.update()
-        await asyncio.sleep(0.01)  # Allow asyncio to run
+    try:
+        await run_gui_loop(root, renderer, on_tick=lambda: update_model_status(model_status_label, MODELS.states))
+    finally:
+        await OLLAMA.close()
+        await REGISTRY.close()
 
 if __name__ == "__main__":
-
-    inmoov = get_inmoov2_instance()
-    if inmoov:
-        print(f"InMoov2 Service Name: {inmoov.name}")
-        print(f"Running Status: {inmoov.isRunning}")
-        print(f"Number of Peers: {len(inmoov.config.peers)}")
-        print("List of Gestures:", ", ".join(inmoov.get_gestures()))
-
-
-    asyncio.run(main())
\ No newline at end of file
+    asyncio.run(main())
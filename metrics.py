@@ -0,0 +1,175 @@
+# metrics.py
+import bisect
+import threading
+import time
+from collections import deque
+from config import METRICS_WINDOW
+from logger import get_logger
+
+log = get_logger(__name__)
+
+# Histogram buckets in seconds (Prometheus `le` bounds)
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+class Histogram:
+    """
+    Latency histogram: cumulative bucket counts for Prometheus, plus the last `window`
+    samples for rolling percentiles.
+    """
+
+    def __init__(self, buckets=BUCKETS, window=METRICS_WINDOW):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self.recent = deque(maxlen=window)
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+        self.recent.append(seconds)
+
+    def percentiles(self, *quantiles):
+        """ Rolling percentiles (in seconds) over the recent samples, e.g. `percentiles(0.5, 0.95)`. """
+        recent = sorted(self.recent)
+        if not recent:
+            return [None] * len(quantiles)
+        return [recent[min(len(recent) - 1, int(len(recent) * q))] for q in quantiles]
+
+
+class FrameTrace:
+    """
+    Timestamps of one frame on its way through the pipeline.
+
+    Each `mark(stage)` closes the interval since the previous mark, so the stage names
+    describe where the time went ("queue", "decode", "infer"...). `captured` is MRL's
+    wall-clock send time (the message's `msgId`) when the message carries one.
+    """
+
+    __slots__ = ("captured", "received_wall", "marks")
+
+    def __init__(self, captured=None):
+        self.captured = captured
+        self.received_wall = time.time()
+        self.marks = [("received", time.perf_counter())]
+
+    def mark(self, stage):
+        self.marks.append((stage, time.perf_counter()))
+
+
+class Metrics:
+    """
+    Per-frame stage latencies, queue depths and drop counters for the video pipeline.
+
+    Stage histograms are fed from finished `FrameTrace`s (and `observe()`), queue depths
+    and counters are read on demand from callbacks registered with `gauge()`/`counter()`.
+    `prometheus()` renders everything in the Prometheus text format, `summary()` as a
+    small dict for the logs and the GUI overlay.
+    """
+
+    def __init__(self):
+        self.histograms = {}
+        self.gauges = {}    # name -> (help, fn)
+        self.counters = {}  # name -> (help, fn)
+        self.lock = threading.Lock()
+
+    def observe(self, stage, seconds):
+        with self.lock:
+            histogram = self.histograms.get(stage)
+            if histogram is None:
+                histogram = self.histograms[stage] = Histogram()
+            histogram.observe(seconds)
+
+    def finish(self, trace):
+        """ Records every interval of a completed frame, plus its total and network latency. """
+        previous = trace.marks[0][1]
+        for stage, timestamp in trace.marks[1:]:
+            self.observe(stage, timestamp - previous)
+            previous = timestamp
+        self.observe("total", previous - trace.marks[0][1])
+
+        if trace.captured is not None:
+            # Needs MRL's clock to be in sync with ours; skip obviously skewed values
+            network = trace.received_wall - trace.captured
+            if 0 <= network < 60:
+                self.observe("network", network)
+
+    def gauge(self, name, help, fn):
+        """ Registers a value read when metrics are collected; `fn()` returns a number. """
+        self.gauges[name] = (help, fn)
+
+    def counter(self, name, help, fn):
+        """ Like `gauge`, for values that only go up (frames dropped, messages sent...). """
+        self.counters[name] = (help, fn)
+
+    def summary(self, stages=("total", "decode", "infer", "network")):
+        """ Rolling p50/p95 in ms per stage, and the current gauges and counters. """
+        summary = {}
+        with self.lock:
+            for stage in stages:
+                if stage in self.histograms:
+                    p50, p95 = self.histograms[stage].percentiles(0.5, 0.95)
+                    summary[stage] = (round(p50 * 1000, 1), round(p95 * 1000, 1))
+        for name, (_, fn) in {**self.gauges, **self.counters}.items():
+            summary[name] = _read(fn)
+        return summary
+
+    def prometheus(self):
+        lines = [
+            "# HELP inmoov_frame_stage_seconds Time frames spend in each pipeline stage.",
+            "# TYPE inmoov_frame_stage_seconds histogram",
+        ]
+        with self.lock:
+            for stage, histogram in self.histograms.items():
+                cumulative = 0
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    cumulative += count
+                    lines.append(f'inmoov_frame_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+                lines.append(f'inmoov_frame_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {histogram.count}')
+                lines.append(f'inmoov_frame_stage_seconds_sum{{stage="{stage}"}} {histogram.sum}')
+                lines.append(f'inmoov_frame_stage_seconds_count{{stage="{stage}"}} {histogram.count}')
+
+        for kind, metrics in (("gauge", self.gauges), ("counter", self.counters)):
+            for name, (help, fn) in metrics.items():
+                value = _read(fn)
+                if value is None:
+                    continue
+                lines.append(f"# HELP inmoov_{name} {help}")
+                lines.append(f"# TYPE inmoov_{name} {kind}")
+                lines.append(f"inmoov_{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def _read(fn):
+    try:
+        return fn()
+    except Exception:
+        return None
+
+
+async def start_metrics_server(metrics, host, port):
+    """ Serves `metrics.prometheus()` on http://host:port/metrics. Returns the aiohttp runner. """
+    from aiohttp import web
+
+    async def handle(request):
+        return web.Response(body=metrics.prometheus().encode("utf-8"),
+                            headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"})
+
+    app = web.Application()
+    app.router.add_get("/metrics", handle)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    try:
+        await web.TCPSite(runner, host, port).start()
+    except OSError as e:
+        log.error(f"Couldn't start the metrics endpoint on {host}:{port}: {e}")
+        await runner.cleanup()
+        return None
+    log.info(f"Metrics on http://{host}:{port}/metrics")
+    return runner
+
+
+# Shared by the pipeline, the connection and the GUI
+METRICS = Metrics()
@@ -0,0 +1,212 @@
+# mock_mrl.py
+"""
+Local stand-in for MRL (and optionally Ollama), for running the client without a robot.
+
+Replays a recording (see `recording.py`) over `/api/messages` at the original rate, faster
+(`--speed 4`) or as fast as the client reads (`--speed 0`), answers `/api/service/<name>`
+with canned JSON, and with `--ollama-port` also serves a deterministic streaming Ollama stub.
+The defaults listen where the client already connects (config.URI, MRL_API_URL, OLLAMA_URL).
+
+Record a session by setting `config.RECORD_PATH`, then:
+
+    python mock_mrl.py session.mrlrec --speed 2 --loop --ollama-port 11434
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+from aiohttp import web, WSMsgType
+from recording import Recording
+from logger import get_logger
+
+log = get_logger(__name__)
+
+# Minimal `/api/service/i01` answer that validates as `mrl_models.InMoov2`
+CANNED_I01 = {
+    "serviceType": {
+        "available": True, "installed": True, "dependencies": [], "description": "InMoov2 (mock)",
+        "includeServiceInOneJar": True, "isCloudService": False, "type": "org.myrobotlab.service.InMoov2",
+        "requiresKeys": False, "simpleName": "InMoov2", "class": "org.myrobotlab.framework.MetaData",
+    },
+    "config": {
+        "type": "InMoov2",
+        "peers": {
+            "chatBot": {"name": "i01.chatBot", "type": "ProgramAB", "autoStart": True, "class": "org.myrobotlab.framework.Peer"},
+            "ear": {"name": "i01.ear", "type": "WebkitSpeechRecognition", "autoStart": True, "class": "org.myrobotlab.framework.Peer"},
+            "opencv": {"name": "i01.opencv", "type": "OpenCV", "autoStart": True, "class": "org.myrobotlab.framework.Peer"},
+        },
+        "class": "org.myrobotlab.service.config.InMoov2Config",
+    },
+    "name": "i01", "id": "mock", "simpleName": "InMoov2", "typeKey": "org.myrobotlab.service.InMoov2",
+    "isRunning": True, "class": "org.myrobotlab.service.InMoov2",
+    "gestures": ["daVinci", "handsUp", "wave"],
+}
+
+
+class MockMrlServer:
+    """ Replays a recording to every WebSocket client and serves canned service JSON. """
+
+    def __init__(self, recording=None, speed=1.0, loop=False, services=None):
+        self.recording = recording
+        self.speed = speed
+        self.loop = loop
+        self.services = services or {"i01": CANNED_I01}
+        self.received = []
+        self.sent = 0
+
+    def app(self):
+        app = web.Application()
+        app.router.add_get("/api/messages", self.messages)
+        app.router.add_get("/api/service/{name}", self.service)
+        return app
+
+    async def service(self, request):
+        name = request.match_info["name"]
+        if name in self.services:
+            return web.json_response(self.services[name])
+        # Peers without canned JSON still answer with the common service fields
+        return web.json_response({"name": name, "id": "mock", "simpleName": name.rsplit(".", 1)[-1], "isRunning": True})
+
+    async def messages(self, request):
+        ws = web.WebSocketResponse(compress=True, max_msg_size=0)
+        await ws.prepare(request)
+        log.info("Client connected.")
+        receiver = asyncio.create_task(self._receive(ws))
+        try:
+            if self.recording is not None:
+                await self._replay(ws)
+            await receiver  # Keep the connection open until the client leaves
+        except ConnectionResetError:
+            pass
+        finally:
+            receiver.cancel()
+            log.info(f"Client disconnected after {self.sent} messages.")
+        return ws
+
+    async def _receive(self, ws):
+        # Commands from the client (say, getResponse, recording...), kept for inspection
+        async for msg in ws:
+            if msg.type == WSMsgType.TEXT:
+                self.received.append(msg.data)
+                log.info(f"Received: {msg.data}")
+
+    async def _replay(self, ws):
+        while True:
+            start = time.monotonic()
+            for timestamp, message in self.recording:
+                if self.speed > 0:
+                    delay = timestamp / self.speed - (time.monotonic() - start)
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                if ws.closed:
+                    return
+                await ws.send_str(message.decode("utf-8"))
+                self.sent += 1
+            if not self.loop:
+                log.info(f"Replay finished: {self.sent} messages in {time.monotonic() - start:.1f}s")
+                return
+
+
+class OllamaStub:
+    """
+    Deterministic stand-in for Ollama's `/api/chat` and `/api/generate`: streams `reply`
+    word by word, after `first_token_delay` and then every `token_delay` seconds.
+    """
+
+    def __init__(self, reply="Hello! I am a mock robot. I can see you clearly.", first_token_delay=0.2, token_delay=0.02):
+        self.reply = reply
+        self.first_token_delay = first_token_delay
+        self.token_delay = token_delay
+        self.requests = []
+
+    def app(self):
+        app = web.Application()
+        app.router.add_post("/api/chat", self.chat)
+        app.router.add_post("/api/generate", self.generate)
+        return app
+
+    async def chat(self, request):
+        return await self._respond(request, lambda text: {"message": {"role": "assistant", "content": text}})
+
+    async def generate(self, request):
+        return await self._respond(request, lambda text: {"response": text})
+
+    async def _respond(self, request, chunk):
+        payload = await request.json()
+        self.requests.append(payload)
+        done = {"done": True, "prompt_eval_count": len(json.dumps(payload)) // 4, "eval_count": len(self.reply.split())}
+
+        if not payload.get("stream", True):
+            await asyncio.sleep(self.first_token_delay)
+            return web.json_response({**chunk(self.reply), **done})
+
+        response = web.StreamResponse(headers={"Content-Type": "application/x-ndjson"})
+        await response.prepare(request)
+        try:
+            await asyncio.sleep(self.first_token_delay)
+            for i, word in enumerate(self.reply.split(" ")):
+                if i:
+                    await asyncio.sleep(self.token_delay)
+                await response.write(json.dumps({**chunk(word if i == 0 else f" {word}"), "done": False}).encode() + b"\n")
+            await response.write(json.dumps({**chunk(""), **done}).encode() + b"\n")
+            await response.write_eof()
+        except ConnectionResetError:
+            pass  # The client cancelled the answer ("Stop LLM", a new question)
+        return response
+
+
+def load_services(directory):
+    """ Canned service JSON from `<directory>/<name>.json` files, plus the default i01. """
+    services = {"i01": CANNED_I01}
+    for filename in os.listdir(directory):
+        if filename.endswith(".json"):
+            with open(os.path.join(directory, filename), encoding="utf-8") as f:
+                services[filename[:-len(".json")]] = json.load(f)
+    return services
+
+
+async def serve(app, host, port):
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
+
+
+async def run(args):
+    recording = Recording(args.recording) if args.recording else None
+    if recording is not None:
+        log.info(f"Recording {args.recording}: {recording.stats()}")
+
+    mrl = MockMrlServer(recording, args.speed, args.loop, load_services(args.services) if args.services else None)
+    runners = [await serve(mrl.app(), args.host, args.port)]
+    log.info(f"Mock MRL on ws://{args.host}:{args.port}/api/messages")
+    if args.ollama_port:
+        runners.append(await serve(OllamaStub().app(), args.host, args.ollama_port))
+        log.info(f"Ollama stub on http://{args.host}:{args.ollama_port}")
+
+    try:
+        await asyncio.Event().wait()
+    finally:
+        for runner in runners:
+            await runner.cleanup()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("recording", nargs="?", help="Recording to replay (see recording.py)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8888)
+    parser.add_argument("--speed", type=float, default=1.0, help="Replay speed factor, 0 = as fast as possible")
+    parser.add_argument("--loop", action="store_true", help="Replay the recording forever")
+    parser.add_argument("--services", help="Directory of <name>.json files served on /api/service/<name>")
+    parser.add_argument("--ollama-port", type=int, help="Also serve an Ollama stub on this port")
+    args = parser.parse_args()
+    try:
+        asyncio.run(run(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+# models.py
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from config import (FRAME_WIDTH, FRAME_HEIGHT, YOLO_BACKEND, YOLO_WEIGHTS, YOLO_IMGSZ, YOLO_CONF,
+                    HANDS_CONFIDENCE, FACE_MESH_CONFIDENCE)
+from logger import get_logger
+
+log = get_logger(__name__)
+
+# Process start reference for the startup phase timings
+STARTUP = time.perf_counter()
+PHASES = {}
+
+
+def mark_phase(name):
+    """ Records how long after startup a phase (GUI up, connected, first frame...) was reached. """
+    if name not in PHASES:
+        PHASES[name] = time.perf_counter() - STARTUP
+        log.info(f"Startup: {name} after {PHASES[name]:.2f}s")
+
+
+class ModelRegistry:
+    """
+    Loads the heavy models (YOLO, Mediapipe graphs) in the background, all at once.
+
+    Each model is "pending", "loading", "ready" or "failed". `get(name)` never blocks:
+    it returns None until the model is ready, so the GUI and WebSocket come up
+    immediately and each detector starts as soon as its own model is loaded.
+    """
+
+    def __init__(self):
+        self.loaders = {}
+        self.models = {}
+        self.states = {}
+        self.load_times = {}
+        self.lock = threading.Lock()
+        self.executor = None
+
+    def register(self, name, loader):
+        """ Adds a model; once `start()` has been called it starts loading right away. """
+        with self.lock:
+            if name in self.loaders:
+                return
+            self.loaders[name] = loader
+            self.states[name] = "pending"
+            started = self.executor is not None
+        if started:
+            self.executor.submit(self._load, name)
+
+    def start(self):
+        """ Starts loading every registered model concurrently. Safe to call more than once. """
+        with self.lock:
+            if self.executor is not None:
+                return
+            self.executor = ThreadPoolExecutor(max_workers=max(len(self.loaders), 3), thread_name_prefix="model-loader")
+            names = list(self.loaders)
+        for name in names:
+            self.executor.submit(self._load, name)
+
+    def _load(self, name):
+        self.states[name] = "loading"
+        start = time.perf_counter()
+        try:
+            model = self.loaders[name]()
+        except Exception as e:
+            self.states[name] = "failed"
+            log.error(f"Failed to load {name}: {e}")
+            return
+        self.models[name] = model
+        self.load_times[name] = time.perf_counter() - start
+        self.states[name] = "ready"
+        mark_phase(f"{name} ready ({self.load_times[name]:.2f}s to load)")
+
+    def get(self, name):
+        """ Returns the model if it's loaded, otherwise None. """
+        return self.models.get(name)
+
+    def ready(self, name):
+        return self.states.get(name) == "ready"
+
+
+def load_yolo():
+    from yolo_backends import create_backend
+    model = create_backend(YOLO_BACKEND, YOLO_WEIGHTS, imgsz=YOLO_IMGSZ, conf=YOLO_CONF)
+    model.warmup((FRAME_HEIGHT, FRAME_WIDTH, 3))
+    return model
+
+
+def load_hands():
+    import mediapipe as mp
+    hands = mp.solutions.hands.Hands(min_detection_confidence=HANDS_CONFIDENCE, min_tracking_confidence=HANDS_CONFIDENCE)
+    hands.process(np.zeros((FRAME_HEIGHT, FRAME_WIDTH, 3), dtype=np.uint8))
+    return hands
+
+
+def load_face_mesh():
+    import mediapipe as mp
+    face_mesh = mp.solutions.face_mesh.FaceMesh(min_detection_confidence=FACE_MESH_CONFIDENCE, min_tracking_confidence=FACE_MESH_CONFIDENCE)
+    face_mesh.process(np.zeros((FRAME_HEIGHT, FRAME_WIDTH, 3), dtype=np.uint8))
+    return face_mesh
+
+
+MODELS = ModelRegistry()
+MODELS.register("yolo", load_yolo)
+MODELS.register("face_mesh", load_face_mesh)
+MODELS.register("hands", load_hands)
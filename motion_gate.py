@@ -0,0 +1,78 @@
+# motion_gate.py
+import time
+import numpy as np
+from config import MOTION_THRESHOLD, MOTION_STEP, MOTION_MAX_STATIC
+
+# ITU-R 601 luma weights for RGB
+GRAY_WEIGHTS = np.array([0.299, 0.587, 0.114], dtype=np.float32)
+
+
+class MotionGate:
+    """
+    Cheap scene-change detector used to skip inference on static frames.
+
+    Each frame is subsampled every `step` pixels and reduced to grayscale in one NumPy
+    dot product (about 12k pixels for a 1024x768 frame at step 8). It is compared against
+    the reference frame from the last time the detectors ran: if the mean absolute
+    difference is below `threshold` (0-255 gray levels) the scene is considered static
+    and the cached detections are reused. Comparing against the reference rather than the
+    previous frame means slow drift still triggers a refresh eventually, and `max_static`
+    forces one after that many seconds regardless.
+
+    `changed()` only measures. `commit()` moves the reference once every detector has run
+    since the last one, so a change that lands between the runs of a rate-limited detector
+    keeps counting as motion until that detector has seen it too.
+    """
+
+    def __init__(self, threshold=MOTION_THRESHOLD, step=MOTION_STEP, max_static=MOTION_MAX_STATIC):
+        self.threshold = threshold
+        self.step = step
+        self.max_static = max_static
+        self.reference = None
+        self.reference_time = 0.0
+        self.candidate = None  # Gray frame from the last `changed()` call, for `commit()`
+        self.seen = set()      # Detectors that ran since the reference was taken
+        self.last_diff = None
+        self.frames = 0
+        self.static_frames = 0
+
+    def changed(self, image, now=None):
+        """ Returns True if the detectors should run on this RGB frame. """
+        self.frames += 1
+        if self.threshold is None:
+            return True
+
+        now = time.monotonic() if now is None else now
+        gray = image[::self.step, ::self.step] @ GRAY_WEIGHTS
+        self.candidate = gray
+
+        if self.reference is not None and self.reference.shape == gray.shape:
+            self.last_diff = float(np.abs(gray - self.reference).mean())
+            stale = self.max_static is not None and now - self.reference_time >= self.max_static
+            if self.last_diff < self.threshold and not stale:
+                self.static_frames += 1
+                return False
+        return True
+
+    def commit(self, ran, expected, now=None):
+        """
+        Records that the detectors in `ran` ran on the frame from the last `changed()` call.
+        Once all of `expected` have, that frame becomes the new reference.
+        """
+        if not ran or self.candidate is None:
+            return
+        self.seen |= ran
+        if self.seen >= expected:
+            self.reference = self.candidate
+            self.reference_time = time.monotonic() if now is None else now
+            self.candidate = None
+            self.seen = set()
+
+    def stats(self):
+        """ How many frames skipped inference (`hit_rate`) and the last measured difference. """
+        return {
+            "frames": self.frames,
+            "static_frames": self.static_frames,
+            "hit_rate": round(self.static_frames / self.frames, 3) if self.frames else 0.0,
+            "last_diff": None if self.last_diff is None else round(self.last_diff, 2),
+        }
@@ -5,6 +5,9 @@ from typing import List, Optional, Dict
 
 from pydantic import BaseModel, Field
 from typing import List, Dict, Optional
+from logger import get_logger
+
+log = get_logger(__name__)
 
 # ✅ Define a Peer Model
 class Peer(BaseModel):
@@ -39,6 +42,20 @@ class ServiceType(BaseModel):
     simpleName: str
     class_: str = Field(alias="class")  # Fix for reserved keyword
 
+    def validated_dependencies(self) -> List[ServiceDependency]:
+        """Validates dependencies on first use when the model was built with `model_construct`."""
+        if self.dependencies and isinstance(self.dependencies[0], dict):
+            self.dependencies = [ServiceDependency(**dependency) for dependency in self.dependencies]
+        return self.dependencies
+
+# ✅ Common fields of any MRL service (peers are many different types, extra fields are ignored)
+class Service(BaseModel):
+    name: str
+    id: Optional[str] = None
+    simpleName: Optional[str] = None
+    typeKey: Optional[str] = None
+    isRunning: bool = False
+
 # ✅ Define InMoov2Config Model (Now includes gestures!)
 class InMoov2Config(BaseModel):
     type: str
@@ -85,10 +102,10 @@ def get_inmoov2_instance():
         return inmoov_instance  # ✅ Return mapped object
 
     except requests.exceptions.RequestException as e:
-        print(f"HTTP Request failed: {e}")
+        log.error(f"HTTP Request failed: {e}")
         return None
     except Exception as e:
-        print(f"Error processing JSON response: {e}")
+        log.error(f"Error processing JSON response: {e}")
         return None
 
 # # ✅ Example Usage:
@@ -0,0 +1,140 @@
+# mrl_registry.py
+import asyncio
+import time
+import aiohttp
+from mrl_models import InMoov2, InMoov2Config, ServiceType, Service
+from config import MRL_API_URL, MRL_REGISTRY_TTL
+from logger import get_logger
+
+log = get_logger(__name__)
+
+
+def parse_inmoov2(json_data, full=False):
+    """
+    Maps `/api/service/i01` JSON to an `InMoov2` model.
+
+    With `full`, the whole tree is validated as before. Otherwise only the parts we use
+    (name, state, peers, gestures) are validated; `serviceType` is built with
+    `model_construct` and keeps its large dependency list as raw dicts until
+    `ServiceType.validated_dependencies()` is called.
+    """
+    if full:
+        return InMoov2(**json_data)
+
+    service_type = json_data.get("serviceType") or {}
+    return InMoov2.model_construct(
+        serviceType=ServiceType.model_construct(
+            class_=service_type.get("class"),
+            **{k: v for k, v in service_type.items() if k != "class"},
+        ),
+        config=InMoov2Config.model_validate(json_data["config"]),
+        name=json_data["name"],
+        id=json_data.get("id"),
+        simpleName=json_data.get("simpleName"),
+        typeKey=json_data.get("typeKey"),
+        isRunning=json_data.get("isRunning", False),
+        class_=json_data.get("class"),
+        gestures=json_data.get("gestures", []),
+    )
+
+
+class ServiceRegistry:
+    """
+    Async, cached client for MRL's service API.
+
+    Services are fetched over one pooled HTTP session and cached for `ttl` seconds (or
+    until `invalidate()`), so repeated lookups of gestures and peers cost nothing.
+    Peers are fetched concurrently. Concurrent lookups of the same service share
+    one request. The JSON is cached per service and parsed once per kind of model asked
+    for, so e.g. `get_service("i01")` and `get_inmoov2("i01")` share the fetch but not the model.
+    """
+
+    def __init__(self, base_url=MRL_API_URL, ttl=MRL_REGISTRY_TTL, pool_size=8):
+        self.base_url = base_url.rstrip("/")
+        self.ttl = ttl
+        self.pool_size = pool_size
+        self.session = None
+        self.cache = {}      # name -> (expires_at, json)
+        self.parsed = {}     # (name, kind) -> (expires_at of the json it came from, model)
+        self.inflight = {}   # name -> task fetching its json
+
+    def _session(self):
+        # As in OllamaClient._session: made on first use (inside the loop), and again after close()
+        if self.session is None or self.session.closed:
+            connector = aiohttp.TCPConnector(limit=self.pool_size, keepalive_timeout=60)
+            self.session = aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=10))
+        return self.session
+
+    async def fetch_json(self, name):
+        async with self._session().get(f"{self.base_url}/{name}") as response:
+            response.raise_for_status()
+            return await response.json(content_type=None)
+
+    async def _json(self, name):
+        """ `(expires_at, json)` of a service, from the cache or one shared request. """
+        entry = self.cache.get(name)
+        if entry and entry[0] > time.monotonic():
+            return entry
+
+        if name not in self.inflight:
+            async def load():
+                try:
+                    entry = (time.monotonic() + self.ttl, await self.fetch_json(name))
+                    self.cache[name] = entry
+                    return entry
+                finally:
+                    del self.inflight[name]
+            self.inflight[name] = asyncio.ensure_future(load())
+        return await asyncio.shield(self.inflight[name])
+
+    async def _get(self, name, kind, parse):
+        expires_at, data = await self._json(name)
+        entry = self.parsed.get((name, kind))
+        if entry and entry[0] == expires_at:
+            return entry[1]
+        model = parse(data)
+        self.parsed[(name, kind)] = (expires_at, model)
+        return model
+
+    async def get_inmoov2(self, name="i01", full=False):
+        """ Returns the InMoov2 service as a (partially validated, see `parse_inmoov2`) model. """
+        return await self._get(name, "inmoov2_full" if full else "inmoov2", lambda data: parse_inmoov2(data, full))
+
+    async def get_service(self, name):
+        """ Returns any service with just its common fields validated (`mrl_models.Service`). """
+        return await self._get(name, "service", Service.model_validate)
+
+    async def get_peers(self, name="i01"):
+        """ Fetches every peer of the InMoov2 service concurrently. Returns {peer key: Service or None}. """
+        inmoov = await self.get_inmoov2(name)
+        keys = list(inmoov.config.peers)
+        results = await asyncio.gather(
+            *(self.get_service(inmoov.config.peers[key].name) for key in keys),
+            return_exceptions=True,
+        )
+        peers = {}
+        for key, result in zip(keys, results):
+            if isinstance(result, Exception):
+                log.warning(f"Couldn't fetch peer {key}: {result}")
+                result = None
+            peers[key] = result
+        return peers
+
+    async def get_gestures(self, name="i01"):
+        return (await self.get_inmoov2(name)).get_gestures()
+
+    def invalidate(self, name=None):
+        """ Drops one service (or everything) from the cache. """
+        if name is None:
+            self.cache.clear()
+            self.parsed.clear()
+        else:
+            self.cache.pop(name, None)
+            self.parsed = {key: entry for key, entry in self.parsed.items() if key[0] != name}
+
+    async def close(self):
+        if self.session and not self.session.closed:
+            await self.session.close()
+
+
+REGISTRY = ServiceRegistry()
@@ -1,10 +1,31 @@
+import asyncio
 import requests
 import base64
+import json
+import re
+import time
+import aiohttp
+from config import OLLAMA_URL, OLLAMA_READ_TIMEOUT, LLM_MODEL, LLM_SYSTEM_PROMPT, LLM_TOKEN_BUDGET, LLM_KEEP_ALIVE
+from logger import get_logger
+
+log = get_logger(__name__)
+
+# End of a sentence: punctuation followed by whitespace
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+def build_prompt(system_prompt, history, user_prompt):
+    """ Formats the system prompt, history and user input into one `/api/generate` prompt. """
+    # Format history into a conversation string
+    formatted_history = "\n".join(f"{m['role'].capitalize()}: {m['content']}" for m in history)
+
+    # Start building the full prompt
+    return f"System: {system_prompt}\n{formatted_history}\nUser: {user_prompt}\nAssistant:"
 
 def call_ollama(api_url="http://localhost:11434/api/generate", model="llama3", 
                 system_prompt="", history=None, user_prompt="", image_path=None):
     """
     Calls a local instance of Ollama with history, system prompt, user input, and an optional image.
+    Blocking: from the event loop use the streaming `OLLAMA` client instead.
     
     Args:
         api_url (str): The URL of the local Ollama instance.
@@ -20,11 +41,7 @@ def call_ollama(api_url="http://localhost:11434/api/generate", model="llama3",
     if history is None:
         history = []
 
-    # Format history into a conversation string
-    formatted_history = "\n".join(f"{m['role'].capitalize()}: {m['content']}" for m in history)
-
-    # Start building the full prompt
-    full_prompt = f"System: {system_prompt}\n{formatted_history}\nUser: {user_prompt}\nAssistant:"
+    full_prompt = build_prompt(system_prompt, history, user_prompt)
 
     # Prepare the payload
     payload = {
@@ -47,6 +64,205 @@ def call_ollama(api_url="http://localhost:11434/api/generate", model="llama3",
     else:
         return f"Error: {response.status_code}, {response.text}"
 
+async def stream_sentences(tokens):
+    """ Groups a token stream into whole sentences, so speech can start after the first one. """
+    buffer = ""
+    async for token in tokens:
+        buffer += token
+        parts = SENTENCE_END.split(buffer)
+        for sentence in parts[:-1]:
+            if sentence.strip():
+                yield sentence.strip()
+        buffer = parts[-1]
+    if buffer.strip():
+        yield buffer.strip()
+
+
+class OllamaClient:
+    """
+    Async Ollama client with a persistent, pooled HTTP session that streams tokens as they
+    are generated. Only one generation runs at a time: starting a new one, or calling
+    `cancel()`, stops the one in flight.
+    """
+
+    def __init__(self, base_url=OLLAMA_URL, pool_size=4, read_timeout=OLLAMA_READ_TIMEOUT):
+        self.base_url = base_url.rstrip("/")
+        self.pool_size = pool_size
+        self.read_timeout = read_timeout
+        self.session = None
+        self.current = None
+
+    def _session(self):
+        # Created lazily: aiohttp sessions must be made inside the running event loop
+        if self.session is None or self.session.closed:
+            connector = aiohttp.TCPConnector(limit=self.pool_size, keepalive_timeout=300)
+            # No total: a long answer streams for as long as it takes, but a stalled one times out
+            timeout = aiohttp.ClientTimeout(total=None, sock_connect=5, sock_read=self.read_timeout)
+            self.session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+        return self.session
+
+    async def stream(self, endpoint, payload, field):
+        """ POSTs a streaming request and yields the text in `field` of each NDJSON chunk. """
+        payload = {**payload, "stream": True}
+        start = time.perf_counter()
+        first = True
+        async with self._session().post(f"{self.base_url}{endpoint}", json=payload) as response:
+            if response.status != 200:
+                raise RuntimeError(f"Ollama error {response.status}: {await response.text()}")
+            async for line in response.content:
+                if not line.strip():
+                    continue
+                chunk = json.loads(line)
+                if "error" in chunk:
+                    raise RuntimeError(f"Ollama error: {chunk['error']}")
+                text = field(chunk)
+                if text:
+                    if first:
+                        first = False
+                        log.info(f"Ollama time to first token: {time.perf_counter() - start:.2f}s")
+                    yield text
+                if chunk.get("done"):
+                    # prompt_eval_count only counts tokens not served from the KV cache
+                    log.info(f"Ollama done in {time.perf_counter() - start:.2f}s: {chunk.get('prompt_eval_count', 0)} prompt tokens evaluated, {chunk.get('eval_count', 0)} generated")
+                    break
+
+    async def stream_chat(self, model, messages, keep_alive=None, options=None):
+        """ Streams the tokens of a `/api/chat` reply. """
+        payload = {"model": model, "messages": messages}
+        if keep_alive is not None:
+            payload["keep_alive"] = keep_alive
+        if options:
+            payload["options"] = options
+        async for text in self.stream("/api/chat", payload, lambda chunk: chunk.get("message", {}).get("content")):
+            yield text
+
+    async def chat(self, model, messages, keep_alive=None, options=None):
+        """ Returns a whole `/api/chat` reply. """
+        return "".join([text async for text in self.stream_chat(model, messages, keep_alive, options)])
+
+    def run(self, coroutine):
+        """ Runs a generation as the current one, cancelling any generation still in flight. """
+        self.cancel()
+        self.current = asyncio.ensure_future(coroutine)
+        return self.current
+
+    def cancel(self):
+        """ Cancels the in-flight generation, if any. Returns True if one was cancelled. """
+        if self.current and not self.current.done():
+            self.current.cancel()
+            return True
+        return False
+
+    async def close(self):
+        self.cancel()
+        if self.session and not self.session.closed:
+            await self.session.close()
+
+
+# Shared client: one pooled session for the whole app
+OLLAMA = OllamaClient()
+
+
+def estimate_tokens(text):
+    """ Rough token count (~4 characters per token), good enough for budgeting history. """
+    return len(text) // 4 + 4
+
+
+class ConversationSession:
+    """
+    A conversation with a visitor, sent to Ollama's `/api/chat`.
+
+    The request always starts with the same system prompt followed by the history in order,
+    and only ever grows at the end, so Ollama can reuse the KV cache of the previous turn
+    and only evaluate the new messages; `keep_alive` keeps the model (and its cache)
+    loaded between turns. When the history goes over `token_budget` the oldest turns are
+    dropped down to `trim_to` of the budget in one go (so the cached prefix changes
+    rarely) and, with `summarize`, folded into a short summary after the system prompt.
+    """
+
+    def __init__(self, client=OLLAMA, model=LLM_MODEL, system_prompt=LLM_SYSTEM_PROMPT,
+                 token_budget=LLM_TOKEN_BUDGET, trim_to=0.6, keep_alive=LLM_KEEP_ALIVE, summarize=True):
+        self.client = client
+        self.model = model
+        self.system_prompt = system_prompt
+        self.token_budget = token_budget
+        self.trim_to = trim_to
+        self.keep_alive = keep_alive
+        self.summarize = summarize
+        self.history = []
+        self.summary = ""
+        self.summary_task = None
+
+    def reset(self):
+        """ Starts a fresh conversation (e.g. for a new visitor). """
+        self.history = []
+        self.summary = ""
+        if self.summary_task:
+            self.summary_task.cancel()
+
+    def is_fresh(self):
+        """ True before the first turn, when an answer doesn't depend on anything said before. """
+        return not self.history and not self.summary
+
+    def messages(self, user_text=None):
+        messages = [{"role": "system", "content": self.system_prompt}]
+        if self.summary:
+            messages.append({"role": "system", "content": f"Summary of the conversation so far: {self.summary}"})
+        messages.extend(self.history)
+        if user_text is not None:
+            messages.append({"role": "user", "content": user_text})
+        return messages
+
+    def history_tokens(self):
+        return sum(estimate_tokens(m["content"]) for m in self.history)
+
+    async def ask(self, user_text):
+        """ Streams the reply to `user_text` and records the turn, even if it's cancelled midway. """
+        reply = []
+        try:
+            async for text in self.client.stream_chat(self.model, self.messages(user_text), keep_alive=self.keep_alive):
+                reply.append(text)
+                yield text
+        finally:
+            if reply:
+                self.record(user_text, "".join(reply))
+
+    def record(self, user_text, reply):
+        """ Adds a turn answered elsewhere (e.g. from the response cache) to the history. """
+        self.history.append({"role": "user", "content": user_text})
+        self.history.append({"role": "assistant", "content": reply})
+        self.trim()
+
+    def trim(self):
+        """ Drops the oldest turns once the history is over budget. """
+        if self.history_tokens() <= self.token_budget:
+            return
+
+        dropped = []
+        while len(self.history) > 2 and self.history_tokens() > self.token_budget * self.trim_to:
+            # Drop whole user/assistant pairs, always keep the latest turn
+            dropped.extend(self.history[:2])
+            del self.history[:2]
+        log.info(f"Conversation trimmed: {len(dropped)} messages dropped, {self.history_tokens()} tokens kept")
+
+        if self.summarize and dropped:
+            self.summary_task = asyncio.ensure_future(self._summarize(dropped))
+
+    async def _summarize(self, dropped):
+        transcript = "\n".join(f"{m['role']}: {m['content']}" for m in dropped)
+        previous = f"Earlier summary: {self.summary}\n" if self.summary else ""
+        try:
+            self.summary = await self.client.chat(self.model, [
+                {"role": "system", "content": "Summarize this conversation in at most three sentences. Keep names and facts about the visitor."},
+                {"role": "user", "content": f"{previous}{transcript}"},
+            ], keep_alive=self.keep_alive)
+        except Exception as e:
+            log.error(f"Conversation summary failed: {e}")
+
+
+# Conversation used by the "Ask LLM" button
+CONVERSATION = ConversationSession()
+
 # # Example usage
 # history = [
 #     {"role": "user", "content": "Hello, who are you?"},
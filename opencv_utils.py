@@ -1,48 +1,149 @@
 # opencv_utils.py
 import cv2
-import base64
+import binascii
 import numpy as np
-from config import MODEL, HANDS, MP_DRAWING, MP_FACE_MESH, FACE_MESH, MP_HANDS
+from yolo_backends import boxes_to_detections
+from config import FRAME_WIDTH, FRAME_HEIGHT, ROI_LABEL, ROI_PADDING, ROI_MAX_SIDE
+from models import MODELS
 
 
-def decode_frame(frame_data):
-    """ Decodes a base64-encoded image frame and resizes it. """
-    frame = base64.b64decode(frame_data)
+def mp_solutions():
+    """ Mediapipe solutions module, imported on first use so startup isn't blocked by it. """
+    import mediapipe as mp
+    return mp.solutions
+
+
+def decode_frame(frame_data, buffers=None):
+    """
+    Decodes a base64-encoded image frame (str or bytes-like, e.g. a memoryview from `frame_parser`),
+    resizes and mirrors it, and returns it in RGB.
+
+    If `buffers` (a `frame_pool.FrameBuffers`) is given, the resize, flip and color conversion
+    write into its preallocated arrays: `buffers.bgr` holds the mirrored BGR frame for YOLO and
+    the returned array is `buffers.rgb`. The sub-stages are marked on `buffers.trace`, if set.
+    """
+    trace = buffers.trace if buffers is not None else None
+    frame = binascii.a2b_base64(frame_data)
+    if trace:
+        trace.mark("base64")
     np_array = np.frombuffer(frame, dtype=np.uint8)
     image = cv2.imdecode(np_array, cv2.IMREAD_COLOR)
+    if trace:
+        trace.mark("imdecode")
 
-    # Resize & Mirror Image
-    resized_image = cv2.resize(image, (1024, 768))
-    mirrored_image = cv2.flip(resized_image, 1)
+    if buffers is None:
+        # Resize & Mirror Image
+        resized_image = cv2.resize(image, (FRAME_WIDTH, FRAME_HEIGHT))
+        mirrored_image = cv2.flip(resized_image, 1)
+        return cv2.cvtColor(mirrored_image, cv2.COLOR_BGR2RGB)
 
-    return cv2.cvtColor(mirrored_image, cv2.COLOR_BGR2RGB)
+    # ✅ Same steps, no per-frame allocations
+    cv2.resize(image, (FRAME_WIDTH, FRAME_HEIGHT), dst=buffers.resized)
+    cv2.flip(buffers.resized, 1, dst=buffers.bgr)
+    cv2.cvtColor(buffers.bgr, cv2.COLOR_BGR2RGB, dst=buffers.rgb)
+    if trace:
+        trace.mark("convert")
+    return buffers.rgb
 
 
 def run_yolo(image):
-    """ Runs YOLOv8 on the given image and returns detection results. """
-    results = MODEL.predict(image, verbose=False)
-    detections = []
+    """ Runs YOLOv8 on the given image (BGR, as Ultralytics expects) and returns detection results. """
+    model = MODELS.get("yolo")
+    if model is None:
+        return []  # Still loading
+    xyxy, conf, cls = model.predict(image)
+    return boxes_to_detections(xyxy, conf, cls, model.names)
 
-    for result in results[0].boxes:
-        x1, y1, x2, y2 = map(int, result.xyxy[0])
-        class_id = int(result.cls)
-        confidence = float(result.conf)
-        label = MODEL.names[class_id]
 
-        detections.append({"bbox": (x1, y1, x2, y2), "label": label, "confidence": confidence})
+def draw_detections(image, detections):
+    """ Draws YOLO bounding boxes and labels onto the image in place. """
+    for detection in detections:
+        x1, y1, x2, y2 = detection["bbox"]
+        label = detection["label"]
+        confidence = detection["confidence"]
 
-    return detections
+        # Draw bounding boxes for all detected objects
+        cv2.rectangle(image, (x1, y1), (x2, y2), (0, 255, 0), 2)
 
+        # Draw labels
+        label_text = f"{label} ({confidence:.2f})"
+        if "track_id" in detection:
+            label_text = f"{label} #{detection['track_id']} ({confidence:.2f})"
+        cv2.putText(image, label_text, (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
 
-def run_mediapipe_face_detection(image):
-    """ Detects faces and determines if the person is smiling or sad. """
+    return image
+
+
+def person_region(detections, shape, label=ROI_LABEL, padding=ROI_PADDING):
+    """
+    The region of interest for the Mediapipe cascade: the box around every `label` detection,
+    grown by `padding` (fraction of its size) on each side and clipped to the frame.
+    Returns `(x1, y1, x2, y2)`, or None if there is nobody in view.
+    """
+    boxes = np.array([det["bbox"] for det in detections if det["label"] == label], dtype=np.float32).reshape(-1, 4)
+    if not len(boxes):
+        return None
+    x1, y1 = boxes[:, :2].min(axis=0)
+    x2, y2 = boxes[:, 2:].max(axis=0)
+    pad_x, pad_y = (x2 - x1) * padding, (y2 - y1) * padding
+    height, width = shape[:2]
+    region = (int(max(0, x1 - pad_x)), int(max(0, y1 - pad_y)), int(min(width, x2 + pad_x)), int(min(height, y2 + pad_y)))
+    if region[2] - region[0] < 2 or region[3] - region[1] < 2:
+        return None
+    return region
+
+
+def crop_region(image, region, max_side=ROI_MAX_SIDE):
+    """ Contiguous crop of the region, downscaled so its longer side is at most `max_side`. """
+    x1, y1, x2, y2 = region
+    crop = image[y1:y2, x1:x2]
+    scale = max_side / max(crop.shape[:2]) if max_side else 1.0
+    if scale < 1.0:
+        size = (max(1, round(crop.shape[1] * scale)), max(1, round(crop.shape[0] * scale)))
+        return cv2.resize(crop, size, interpolation=cv2.INTER_AREA)
+    return np.ascontiguousarray(crop)
+
+
+def remap_landmarks(landmarks_list, region, shape):
+    """ Moves Mediapipe landmarks (normalized to a crop of `region`) to normalized frame coordinates, in place. """
+    x1, y1, x2, y2 = region
+    height, width = shape[:2]
+    scale_x, scale_y = (x2 - x1) / width, (y2 - y1) / height
+    offset_x, offset_y = x1 / width, y1 / height
+    for landmarks in landmarks_list:
+        for landmark in landmarks.landmark:
+            landmark.x = offset_x + landmark.x * scale_x
+            landmark.y = offset_y + landmark.y * scale_y
+            landmark.z *= scale_x  # z is on the same scale as x
+
+
+def process_landmarks(graph, image, field, region=None):
+    """
+    Runs a Mediapipe graph on the RGB image, or only on `region` of it (see `person_region`),
+    and returns its `field` landmark lists in frame coordinates either way.
+    """
+    if graph is None:
+        return []  # Still loading
+    if region is None:
+        return getattr(graph.process(image), field) or []
+    landmarks_list = getattr(graph.process(crop_region(image, region)), field) or []
+    remap_landmarks(landmarks_list, region, image.shape)
+    return landmarks_list
+
+
+def detect_face(image, model="face_mesh", region=None):
+    """
+    Runs the Mediapipe face mesh on an RGB image without drawing anything.
+    Returns a dict with `face_detected`, `is_smiling`, `is_sad` and the raw `landmarks`.
+    `model` is the graph's name in `MODELS` (each video stream has its own, they track state).
+    With a `region` only that crop is processed; the landmarks are still in frame coordinates.
+    """
     face_detected, is_smiling, is_sad = False, False, False
-    image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-    results = FACE_MESH.process(image_rgb)
+    landmarks_list = process_landmarks(MODELS.get(model), image, "multi_face_landmarks", region)
 
-    if results.multi_face_landmarks:
+    if landmarks_list:
         face_detected = True
-        for face_landmarks in results.multi_face_landmarks:
+        for face_landmarks in landmarks_list:
             landmarks = face_landmarks.landmark
             left_mouth = landmarks[61]
             right_mouth = landmarks[291]
@@ -58,37 +159,47 @@ def run_mediapipe_face_detection(image):
             elif mouth_height < smile_threshold * 0.6:
                 is_sad = True
 
-            MP_DRAWING.draw_landmarks(image, face_landmarks, MP_FACE_MESH.FACEMESH_TESSELATION)
+    return {"face_detected": face_detected, "is_smiling": is_smiling, "is_sad": is_sad, "landmarks": landmarks_list}
 
-    return face_detected, is_smiling, is_sad, image
 
+def draw_face(image, face):
+    """ Draws the face mesh from a `detect_face` result onto the image in place. """
+    if face["landmarks"]:
+        solutions = mp_solutions()
+        for face_landmarks in face["landmarks"]:
+            solutions.drawing_utils.draw_landmarks(image, face_landmarks, solutions.face_mesh.FACEMESH_TESSELATION)
+    return image
 
-def run_mediapipe_hand_tracking(image):
+
+def run_mediapipe_face_detection(image):
+    """ Detects faces on an RGB image and determines if the person is smiling or sad. """
+    face = detect_face(image)
+    draw_face(image, face)
+    return face["face_detected"], face["is_smiling"], face["is_sad"], image
+
+
+def detect_hands(image, model="hands", region=None):
     """
-    Uses Mediapipe to detect hands and determine if a hand is raised.
-    Returns:
-    - `hand_detected` (bool): Whether a hand is detected.
-    - `raised_hand` (bool): Whether a hand is raised.
-    - `image`: Image with hand landmarks drawn.
+    Runs Mediapipe hand tracking on an RGB image without drawing anything.
+    Returns a dict with `hand_detected`, `raised_hand` and the raw `landmarks`.
+    `model` and `region` are as for `detect_face`.
     """
     hand_detected = False
     raised_hand = False
 
-    # Convert image to RGB (Mediapipe expects RGB format)
-    image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+    # Process the image with Mediapipe (`decode_frame` already returns RGB)
+    landmarks_list = process_landmarks(MODELS.get(model), image, "multi_hand_landmarks", region)
 
-    # Process the image with Mediapipe
-    results = HANDS.process(image_rgb)
-
-    if results.multi_hand_landmarks:
+    if landmarks_list:
         hand_detected = True  # ✅ At least one hand detected
+        mp_hands = mp_solutions().hands
 
-        for hand_landmarks in results.multi_hand_landmarks:
+        for hand_landmarks in landmarks_list:
             # ✅ Get coordinates for wrist and fingertips
-            wrist_y = hand_landmarks.landmark[MP_HANDS.HandLandmark.WRIST].y
-            index_finger_tip_y = hand_landmarks.landmark[MP_HANDS.HandLandmark.INDEX_FINGER_TIP].y
-            middle_finger_tip_y = hand_landmarks.landmark[MP_HANDS.HandLandmark.MIDDLE_FINGER_TIP].y
-            pinky_finger_tip_y = hand_landmarks.landmark[MP_HANDS.HandLandmark.PINKY_TIP].y
+            wrist_y = hand_landmarks.landmark[mp_hands.HandLandmark.WRIST].y
+            index_finger_tip_y = hand_landmarks.landmark[mp_hands.HandLandmark.INDEX_FINGER_TIP].y
+            middle_finger_tip_y = hand_landmarks.landmark[mp_hands.HandLandmark.MIDDLE_FINGER_TIP].y
+            pinky_finger_tip_y = hand_landmarks.landmark[mp_hands.HandLandmark.PINKY_TIP].y
 
             # ✅ Check if fingers are above the wrist
             fingers_above_wrist = sum([
@@ -101,7 +212,27 @@ def run_mediapipe_hand_tracking(image):
             if fingers_above_wrist >= 2:
                 raised_hand = True
 
+    return {"hand_detected": hand_detected, "raised_hand": raised_hand, "landmarks": landmarks_list}
+
+
+def draw_hands(image, hands):
+    """ Draws the hand landmarks from a `detect_hands` result onto the image in place. """
+    if hands["landmarks"]:
+        solutions = mp_solutions()
+        for hand_landmarks in hands["landmarks"]:
             # ✅ FIX: Use `mp_hands.HAND_CONNECTIONS` instead of `hands.HAND_CONNECTIONS`
-            MP_DRAWING.draw_landmarks(image, hand_landmarks, MP_HANDS.HAND_CONNECTIONS)
+            solutions.drawing_utils.draw_landmarks(image, hand_landmarks, solutions.hands.HAND_CONNECTIONS)
+    return image
+
 
-    return hand_detected, raised_hand, image
\ No newline at end of file
+def run_mediapipe_hand_tracking(image):
+    """
+    Uses Mediapipe to detect hands on an RGB image and determine if a hand is raised.
+    Returns:
+    - `hand_detected` (bool): Whether a hand is detected.
+    - `raised_hand` (bool): Whether a hand is raised.
+    - `image`: Image with hand landmarks drawn.
+    """
+    hands = detect_hands(image)
+    draw_hands(image, hands)
+    return hands["hand_detected"], hands["raised_hand"], image
@@ -0,0 +1,267 @@
+# pipeline.py
+import asyncio
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from frame_pool import FrameBufferPool
+from opencv_utils import decode_frame
+from scheduler import create_default_scheduler
+from motion_gate import MotionGate
+from tracking import SceneTracker
+from config import TRACKING
+from metrics import METRICS
+from logger import get_logger
+
+log = get_logger(__name__)
+
+
+def infer_frame(buffers, scheduler, motion_gate=None, now=None, tracker=None):
+    """
+    Runs the due detectors on a decoded frame and returns the annotated result.
+    YOLO reads the BGR frame, Mediapipe and the overlays share the RGB one.
+    On a static frame (per `motion_gate`) the cached detections are reused.
+    With a `tracker` (`tracking.SceneTracker`) boxes carry a `track_id` and the face/hand
+    flags are smoothed; "events" lists what changed on this frame.
+    `now` overrides the clock, e.g. to replay frames at a simulated rate.
+    """
+    now = time.monotonic() if now is None else now
+    changed = motion_gate.changed(buffers.rgb, now) if motion_gate else True
+    results = scheduler.run(buffers, now=now, changed=changed)
+    if motion_gate:
+        motion_gate.commit(scheduler.ran, scheduler.active(), now)
+    events = []
+    if tracker:
+        results, events = tracker.update(results, scheduler.ran, now, changed)
+    image = scheduler.draw(buffers.rgb, results)
+
+    face = results["face"]
+    hands = results["hands"]
+    return {
+        "image": image,
+        "detections": results["yolo"],
+        "face_detected": face["face_detected"],
+        "is_smiling": face["is_smiling"],
+        "is_sad": face["is_sad"],
+        "hand_detected": hands["hand_detected"],
+        "raised_hand": hands["raised_hand"],
+        "events": events,
+    }
+
+
+class RateMeter:
+    """ Counts events and reports their rate over a sliding time window. """
+
+    def __init__(self, window=5.0):
+        self.window = window
+        self.count = 0
+        self.timestamps = deque()
+
+    def mark(self):
+        now = time.monotonic()
+        self.count += 1
+        self.timestamps.append(now)
+        while self.timestamps and now - self.timestamps[0] > self.window:
+            self.timestamps.popleft()
+
+    def rate(self):
+        """ Events per second over the window. """
+        now = time.monotonic()
+        while self.timestamps and now - self.timestamps[0] > self.window:
+            self.timestamps.popleft()
+        if len(self.timestamps) < 2:
+            return 0.0
+        span = now - self.timestamps[0]
+        return len(self.timestamps) / span if span > 0 else 0.0
+
+
+class LatestFrameMailbox:
+    """
+    Single-slot mailbox with latest-wins semantics.
+
+    `put` never blocks: a frame that hasn't been picked up yet is overwritten and
+    counted as dropped. `get` waits for a frame and always returns the newest one.
+    """
+
+    def __init__(self, on_drop=None):
+        self.on_drop = on_drop
+        self.item = None
+        self.has_item = False
+        self.event = asyncio.Event()
+        self.dropped = 0
+
+    def put(self, item):
+        """ Stores the item, replacing any pending one. Returns False if a frame was dropped. """
+        replaced = self.has_item
+        if replaced:
+            self.dropped += 1
+            if self.on_drop:
+                self.on_drop(self.item)
+        self.item = item
+        self.has_item = True
+        self.event.set()
+        return not replaced
+
+    async def get(self):
+        """ Waits for and takes the newest item. """
+        while not self.has_item:
+            self.event.clear()
+            await self.event.wait()
+        item = self.item
+        self.item = None
+        self.has_item = False
+        self.event.clear()
+        return item
+
+    def __len__(self):
+        return 1 if self.has_item else 0
+
+
+class FramePipeline:
+    """
+    Staged video pipeline: receive -> decode -> infer -> render.
+
+    The receive stage (`submit`) runs on the event loop and never blocks. Decode and
+    inference each run on their own worker thread so frame N+1 can be decoded while
+    frame N is in the detectors (see `scheduler.DetectorScheduler`). Stages are joined
+    by latest-frame mailboxes, so a slow stage drops stale frames instead of building
+    a backlog. The render callback is called back on the event loop with the result
+    dict from `infer_frame`. Each stream has its own `tracking.SceneTracker` (unless
+    config.TRACKING is off).
+
+    Threads are used rather than processes: the YOLO model and Mediapipe graphs can't be
+    pickled, and OpenCV, torch and Mediapipe release the GIL while they work.
+    """
+
+    def __init__(self, render, scheduler=None, motion_gate=None, name="main", tracker=None):
+        self.name = name
+        self.render = render
+        self.scheduler = scheduler or create_default_scheduler()
+        self.motion_gate = motion_gate or MotionGate()
+        self.tracker = tracker or (SceneTracker() if TRACKING else None)
+        self.pool = FrameBufferPool()
+        self.frames = LatestFrameMailbox()
+        self.decoded = LatestFrameMailbox(on_drop=self.pool.release)
+        self.incoming = RateMeter()
+        self.processed = RateMeter()
+        self.decode_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="decode")
+        self.infer_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="infer")
+        self.tasks = []
+        # Most recently processed frame, held back from the pool (see `latest_frame`)
+        self.latest = None
+        self.latest_result = None
+        self.frame_id = 0
+
+    def start(self):
+        """ Starts the decode and inference stages on the running event loop. """
+        if not self.tasks:
+            self.tasks = [
+                asyncio.create_task(self._decode_stage()),
+                asyncio.create_task(self._infer_stage()),
+            ]
+
+    def submit(self, frame_data, trace=None):
+        """
+        Hands a base64 frame to the decode stage, replacing any frame still waiting.
+        `trace` (a `metrics.FrameTrace`) is marked at each stage and recorded once the frame is rendered.
+        """
+        self.incoming.mark()
+        return self.frames.put((frame_data, trace))
+
+    def stats(self):
+        """ Returns frame counters and incoming vs. processed FPS. """
+        return {
+            "received": self.incoming.count,
+            "processed": self.processed.count,
+            "dropped": self.frames.dropped + self.decoded.dropped,
+            "frame_buffers": self.pool.allocated,
+            "detectors": self.scheduler.stats(),
+            "motion": self.motion_gate.stats(),
+            "incoming_fps": round(self.incoming.rate(), 1),
+            "processed_fps": round(self.processed.rate(), 1),
+        }
+
+    def register_metrics(self, metrics=METRICS, prefix=""):
+        """ Exposes queue depths and drop counters (see `metrics.Metrics`), named with `prefix` per stream. """
+        metrics.gauge(f"{prefix}queue_depth_decode", "Frames waiting for the decoder (0 or 1).", lambda: len(self.frames))
+        metrics.gauge(f"{prefix}queue_depth_infer", "Decoded frames waiting for the detectors (0 or 1).", lambda: len(self.decoded))
+        metrics.gauge(f"{prefix}frame_buffers", "Frame buffer sets allocated by the pool.", lambda: self.pool.allocated)
+        metrics.gauge(f"{prefix}incoming_fps", "Frames received per second.", self.incoming.rate)
+        metrics.gauge(f"{prefix}processed_fps", "Frames processed per second.", self.processed.rate)
+        metrics.counter(f"{prefix}frames_received_total", "Frames received.", lambda: self.incoming.count)
+        metrics.counter(f"{prefix}frames_processed_total", "Frames processed.", lambda: self.processed.count)
+        metrics.counter(f"{prefix}frames_dropped_decode_total", "Frames replaced before the decoder got to them.", lambda: self.frames.dropped)
+        metrics.counter(f"{prefix}frames_dropped_infer_total", "Decoded frames replaced before the detectors got to them.", lambda: self.decoded.dropped)
+        metrics.counter(f"{prefix}frames_static_total", "Frames that skipped detection as unchanged.", lambda: self.motion_gate.static_frames)
+
+    def latest_frame(self):
+        """
+        Returns `(frame_id, bgr, result)` for the most recently processed frame, or None.
+        `bgr` is the clean (un-annotated) frame; it stays valid until the next frame is
+        rendered, so only read it on the event loop or copy it first.
+        """
+        if self.latest is None:
+            return None
+        return self.frame_id, self.latest.bgr, self.latest_result
+
+    async def _decode_stage(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            frame_data, trace = await self.frames.get()
+            if trace:
+                trace.mark("queue")
+            buffers = self.pool.acquire()
+            buffers.trace = trace
+            start = time.perf_counter()
+            try:
+                await loop.run_in_executor(self.decode_executor, decode_frame, frame_data, buffers)
+            except Exception as e:
+                log.error(f"Frame decode error: {e}")
+                self.pool.release(buffers)
+                continue
+            # Whole decode step; the trace has it split into base64 / imdecode / convert
+            METRICS.observe("decode", time.perf_counter() - start)
+            self.decoded.put(buffers)
+
+    async def _infer_stage(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            buffers = await self.decoded.get()
+            trace = buffers.trace
+            if trace:
+                trace.mark("handoff")
+            try:
+                result = await loop.run_in_executor(self.infer_executor, infer_frame, buffers, self.scheduler, self.motion_gate, None, self.tracker)
+            except Exception as e:
+                log.error(f"Inference error: {e}")
+                self.pool.release(buffers)
+                continue
+
+            self.processed.mark()
+            if trace:
+                trace.mark("infer")
+            result["stream"] = self.name
+
+            try:
+                self.render(result)
+            except Exception as e:
+                log.error(f"Render error: {e}")
+            finally:
+                if trace:
+                    trace.mark("render")
+                    METRICS.finish(trace)
+                    buffers.trace = None
+                # The GUI has copied the frame, keep it as the latest and recycle the previous one
+                self.pool.release(self.latest)
+                self.latest = buffers
+                self.latest_result = result
+                self.frame_id += 1
+
+    async def stop(self):
+        """ Cancels the pipeline stages and shuts down the worker threads. """
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+        self.decode_executor.shutdown(wait=False, cancel_futures=True)
+        self.infer_executor.shutdown(wait=False, cancel_futures=True)
+        self.scheduler.shutdown()
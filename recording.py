@@ -0,0 +1,188 @@
+# recording.py
+"""
+Compact recordings of the raw MRL WebSocket stream, for replaying without a robot.
+
+File layout (little endian):
+
+    b"MRLREC2\\n"
+    record*                 struct RECORD (seconds since start, kind, length) + payload
+    index                   uint64 file offset of every record
+    footer                  struct FOOTER (index offset, record count, b"MRLIDX1\\n")
+
+Kinds:
+    MESSAGE   any message, stored as received
+    TEMPLATE  an `onWebDisplay` message with the base64 payload replaced by PLACEHOLDER
+              and every number (msgId, timestamps) by FIELD; only written when it
+              differs from the previous one
+    FRAME     uint16 length + the template's numbers joined by "," + the raw JPEG bytes
+              of an `onWebDisplay` frame (about 25% smaller than base64), rebuilt into a
+              message with the last TEMPLATE on replay
+
+A recording that wasn't closed (e.g. the client crashed) has no index; the reader then
+scans it record by record up to the last complete one.
+"""
+import base64
+import binascii
+import os
+import re
+import struct
+import time
+from frame_parser import frame_span, get_method, WEB_DISPLAY
+
+MAGIC = b"MRLREC2\n"
+INDEX_MAGIC = b"MRLIDX1\n"
+RECORD = struct.Struct("<dBI")
+FOOTER = struct.Struct("<QI8s")
+FIELDS = struct.Struct("<H")
+PLACEHOLDER = b"\x00FRAME\x00"
+FIELD = b"\x00#\x00"
+DIGITS = re.compile(rb"\d+")
+
+MESSAGE, TEMPLATE, FRAME = 0, 1, 2
+
+
+class Recorder:
+    """ Appends received messages to a recording. Use `write()` from the receive loop, `close()` at the end. """
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "wb", buffering=1024 * 1024)
+        self.file.write(MAGIC)
+        self.offsets = []
+        self.template = None
+        self.started = time.monotonic()
+        self.frames = 0
+        self.messages = 0
+
+    def _record(self, timestamp, kind, payload):
+        self.offsets.append(self.file.tell())
+        self.file.write(RECORD.pack(timestamp, kind, len(payload)))
+        self.file.write(payload)
+
+    def write(self, message, timestamp=None):
+        if self.file is None:
+            return
+        if timestamp is None:
+            timestamp = time.monotonic() - self.started
+        data = message.encode("utf-8") if isinstance(message, str) else bytes(message)
+
+        span = frame_span(data) if get_method(data) == WEB_DISPLAY else None
+        if span is None:
+            self._record(timestamp, MESSAGE, data)
+            self.messages += 1
+            return
+
+        start, end = span
+        header = data[:start] + PLACEHOLDER + data[end:]
+        # The msgId changes with every frame: keep it (and any other number) in the FRAME record
+        fields = b",".join(DIGITS.findall(header))
+        template = DIGITS.sub(FIELD, header)
+        if template != self.template:
+            self._record(timestamp, TEMPLATE, template)
+            self.template = template
+        self._record(timestamp, FRAME, FIELDS.pack(len(fields)) + fields + binascii.a2b_base64(memoryview(data)[start:end]))
+        self.frames += 1
+
+    def close(self):
+        if self.file is None:
+            return
+        index_offset = self.file.tell()
+        self.file.write(struct.pack(f"<{len(self.offsets)}Q", *self.offsets))
+        self.file.write(FOOTER.pack(index_offset, len(self.offsets), INDEX_MAGIC))
+        self.file.close()
+        self.file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class Recording:
+    """
+    Reads a recording. Iterating yields `(timestamp, message_bytes)` with frames rebuilt
+    into `onWebDisplay` messages exactly like MRL sends them.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self.data = f.read()
+        if not self.data.startswith(MAGIC):
+            raise ValueError(f"{path} is not an MRL recording")
+        self.offsets = self._read_index()
+
+    def _read_index(self):
+        if len(self.data) >= len(MAGIC) + FOOTER.size:
+            index_offset, count, magic = FOOTER.unpack_from(self.data, len(self.data) - FOOTER.size)
+            if magic == INDEX_MAGIC:
+                return list(struct.unpack_from(f"<{count}Q", self.data, index_offset))
+
+        # No index: scan the complete records
+        offsets = []
+        offset = len(MAGIC)
+        while offset + RECORD.size <= len(self.data):
+            length = RECORD.unpack_from(self.data, offset)[2]
+            if offset + RECORD.size + length > len(self.data):
+                break
+            offsets.append(offset)
+            offset += RECORD.size + length
+        return offsets
+
+    def record(self, i):
+        """ Returns `(timestamp, kind, payload)` of the i-th record. """
+        offset = self.offsets[i]
+        timestamp, kind, length = RECORD.unpack_from(self.data, offset)
+        start = offset + RECORD.size
+        return timestamp, kind, memoryview(self.data)[start:start + length]
+
+    @staticmethod
+    def split_frame(payload):
+        """ `(fields, jpeg)` of a FRAME record's payload. """
+        length = FIELDS.unpack_from(payload)[0]
+        fields = bytes(payload[FIELDS.size:FIELDS.size + length])
+        return (fields.split(b",") if length else []), payload[FIELDS.size + length:]
+
+    def frames(self):
+        """ Yields `(timestamp, jpeg_bytes)` of every frame. """
+        for i in range(len(self.offsets)):
+            timestamp, kind, payload = self.record(i)
+            if kind == FRAME:
+                yield timestamp, bytes(self.split_frame(payload)[1])
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __iter__(self):
+        parts = None
+        for i in range(len(self.offsets)):
+            timestamp, kind, payload = self.record(i)
+            if kind == MESSAGE:
+                yield timestamp, bytes(payload)
+            elif kind == TEMPLATE:
+                parts = bytes(payload).split(FIELD)
+            elif kind == FRAME and parts is not None:
+                fields, jpeg = self.split_frame(payload)
+                header = bytearray(parts[0])
+                for field, part in zip(fields, parts[1:]):
+                    header += field
+                    header += part
+                prefix, _, suffix = bytes(header).partition(PLACEHOLDER)
+                yield timestamp, prefix + base64.b64encode(jpeg) + suffix
+
+    def duration(self):
+        return self.record(len(self.offsets) - 1)[0] if self.offsets else 0.0
+
+    def stats(self):
+        counts = {MESSAGE: 0, TEMPLATE: 0, FRAME: 0}
+        for i in range(len(self.offsets)):
+            counts[self.record(i)[1]] += 1
+        return {
+            "records": len(self.offsets),
+            "frames": counts[FRAME],
+            "templates": counts[TEMPLATE],
+            "messages": counts[MESSAGE],
+            "duration_s": round(self.duration(), 2),
+            "size_mb": round(os.path.getsize(self.path) / 1e6, 2),
+        }
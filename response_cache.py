@@ -0,0 +1,142 @@
+# response_cache.py
+import atexit
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from config import RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL, RESPONSE_CACHE_PATH
+from logger import get_logger
+
+log = get_logger(__name__)
+
+NOT_WORD = re.compile(r"[^\w\s]")
+SPACES = re.compile(r"\s+")
+
+
+def normalize_prompt(text):
+    """ "What's your NAME?" and "whats your name" map to the same key. """
+    return SPACES.sub(" ", NOT_WORD.sub("", text.lower())).strip()
+
+
+def cache_key(prompt, model="", system_prompt=""):
+    """ Key on the normalized prompt plus the model and system prompt that answered it. """
+    raw = "\x1f".join((normalize_prompt(prompt), model, system_prompt))
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    LRU + TTL cache of answers to visitors' questions.
+
+    At most `max_entries` answers are kept (least recently used evicted first), each for
+    `ttl` seconds. With `path`, entries are loaded at startup and saved at most every
+    `save_interval` seconds and at exit, so common questions survive restarts. The file
+    is only read on first use, so importing the module doesn't touch the disk.
+    """
+
+    def __init__(self, max_entries=RESPONSE_CACHE_SIZE, ttl=RESPONSE_CACHE_TTL, path=RESPONSE_CACHE_PATH, save_interval=30.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.path = path
+        self.save_interval = save_interval
+        self.entries = OrderedDict()  # key -> (response, expires_at)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.dirty = False
+        self.last_save = time.monotonic()
+        self.loaded = False
+
+    def _load_once(self):
+        if self.loaded:
+            return
+        self.loaded = True
+        if self.path:
+            self.load()
+            atexit.register(self.save)
+
+    def get(self, prompt, model="", system_prompt=""):
+        """ Returns the cached answer, or None. """
+        self._load_once()
+        key = cache_key(prompt, model, system_prompt)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[1] < time.time():
+                del self.entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, prompt, response, model="", system_prompt=""):
+        if not response:
+            return
+        self._load_once()
+        key = cache_key(prompt, model, system_prompt)
+        with self.lock:
+            self.entries[key] = (response, time.time() + self.ttl)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+            self.dirty = True
+        if self.path and time.monotonic() - self.last_save >= self.save_interval:
+            self.save()
+
+    def clear(self):
+        self._load_once()
+        with self.lock:
+            self.entries.clear()
+            self.dirty = True
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "evictions": self.evictions,
+        }
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            log.error(f"Couldn't load response cache {self.path}: {e}")
+            return
+        now = time.time()
+        for key, (response, expires_at) in data.items():
+            if expires_at > now:
+                self.entries[key] = (response, expires_at)
+        log.info(f"Response cache: {len(self.entries)} answers loaded from {self.path}")
+
+    def save(self):
+        """ Writes the cache to `path` atomically (temp file + rename). """
+        if not self.path or not self.dirty:
+            return
+        with self.lock:
+            data = dict(self.entries)
+            self.dirty = False
+        self.last_save = time.monotonic()
+        tmp = f"{self.path}.tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            log.error(f"Couldn't save response cache {self.path}: {e}")
+
+
+# Shared cache for the LLM ("askllm") and chatbot ("ask"/"llm") paths
+RESPONSE_CACHE = ResponseCache()
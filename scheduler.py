@@ -0,0 +1,196 @@
+# scheduler.py
+import functools
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait
+from opencv_utils import run_yolo, draw_detections, detect_face, draw_face, detect_hands, draw_hands, person_region
+from config import DETECTORS, DETECTOR_SLOTS, ROI_CASCADE, ROI_MAX_AREA
+from models import MODELS
+from metrics import METRICS
+
+# Results of the face and hands detectors before they've run (or with nobody in view)
+EMPTY_FACE = {"face_detected": False, "is_smiling": False, "is_sad": False, "landmarks": []}
+EMPTY_HANDS = {"hand_detected": False, "raised_hand": False, "landmarks": []}
+
+
+class Detector:
+    """
+    A detector run by the `DetectorScheduler`.
+    - `detect(image)` returns the detector's result; `draw(image, result)` draws its overlay.
+    - `source` is the frame it reads: "bgr" (YOLO) or "rgb" (Mediapipe).
+    - `rate` is the target rate in Hz (None = every processed frame).
+    - `priority`: lower values get the scheduler's slots first when more detectors are due
+      than it runs at once; the others wait for the next frame.
+    - `model`: name in `models.MODELS`; the detector is skipped until that model is ready.
+    - `cascade`: only look around the people YOLO found, `detect(image, region=...)`
+      (see `opencv_utils.person_region`); with nobody in view it doesn't run at all, with
+      people spread over most of the frame it gets the whole frame.
+    """
+
+    def __init__(self, name, detect, draw=None, source="rgb", rate=None, priority=0, empty_result=None, model=None, cascade=False):
+        self.name = name
+        self.model = model
+        self.detect = detect
+        self.draw = draw
+        self.source = source
+        self.rate = rate
+        self.priority = priority
+        self.cascade = cascade
+        self.empty_result = empty_result
+        self.result = empty_result
+        self.last_run = None
+        self.runs = 0
+        self.skipped = 0
+        self.postponed = 0
+        self.waiting = 0  # Frames in a row this detector was due but postponed
+        self.latencies = deque(maxlen=100)
+
+    def is_due(self, now):
+        if self.model and not MODELS.ready(self.model):
+            return False
+        if self.last_run is None or not self.rate:
+            return True
+        return now - self.last_run >= 1.0 / self.rate
+
+    def urgency(self):
+        """
+        Sort key for the slots: the priority, moved up one level for every frame in a row the
+        detector was postponed, so a low-priority detector is delayed but never starved.
+        """
+        return self.priority - self.waiting
+
+    def run(self, image, region=None):
+        start = time.perf_counter()
+        self.result = self.detect(image) if region is None else self.detect(image, region=region)
+        elapsed = time.perf_counter() - start
+        self.latencies.append(elapsed)
+        METRICS.observe(self.name, elapsed)
+        self.runs += 1
+        return self.result
+
+    def stats(self):
+        latencies = sorted(self.latencies)
+        state = MODELS.states.get(self.model, "ready")
+        if not latencies:
+            return {"state": state, "rate": self.rate, "runs": self.runs, "skipped": self.skipped, "postponed": self.postponed}
+        return {
+            "state": state,
+            "rate": self.rate,
+            "runs": self.runs,
+            "skipped": self.skipped,
+            "postponed": self.postponed,
+            "last_ms": round(self.latencies[-1] * 1000, 1),
+            "avg_ms": round(sum(latencies) / len(latencies) * 1000, 1),
+            "p95_ms": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000, 1),
+        }
+
+
+class DetectorScheduler:
+    """
+    Runs each detector at its own rate and reuses its last result in between.
+
+    Detectors that are due on a frame run concurrently on a thread pool: each one owns its
+    own model/graph, and torch and Mediapipe release the GIL, so YOLO, the face mesh and
+    hand tracking can overlap. A detector never runs twice at the same time.
+
+    At most `slots` detectors run per frame, which bounds the CPU one frame can take. When
+    more are due, they get the slots by priority (see `Detector.urgency`) and the rest stay
+    due for the next frame.
+
+    Cascaded detectors (face mesh, hands) use the person boxes from the latest finished YOLO
+    run rather than waiting for this frame's, so all three still run side by side.
+
+    Pass `executor` to share one pool between several schedulers (see `inference.InferencePool`).
+    """
+
+    def __init__(self, detectors, max_workers=None, executor=None, slots=DETECTOR_SLOTS):
+        self.detectors = sorted(detectors, key=lambda d: d.priority)
+        self.slots = slots or len(self.detectors)
+        self.owns_executor = executor is None
+        self.executor = executor or ThreadPoolExecutor(max_workers=max_workers or self.slots, thread_name_prefix="detector")
+        self.ran = set()  # Names of the detectors whose result was refreshed on the last frame
+
+    def run(self, buffers, now=None, changed=True):
+        """
+        Runs the due detectors on the frame and returns every detector's latest result by name.
+        When `changed` is False (static scene, see `motion_gate.MotionGate`) nothing runs.
+        """
+        now = time.monotonic() if now is None else now
+        futures = []
+        self.ran = set()
+        region, people = self._person_region(buffers)
+        due = [detector for detector in self.detectors if changed and detector.is_due(now)]
+        for detector in sorted(due, key=lambda d: d.urgency()):
+            if detector.cascade and not people:
+                # Nobody in view: nothing for the face/hand graphs to find
+                detector.result = detector.empty_result
+                detector.skipped += 1
+                self.ran.add(detector.name)
+                continue
+            if len(futures) == self.slots:
+                detector.postponed += 1
+                detector.waiting += 1
+                continue
+            detector.waiting = 0
+            detector.last_run = now
+            self.ran.add(detector.name)
+            image = getattr(buffers, detector.source)
+            futures.append(self.executor.submit(detector.run, image, region if detector.cascade else None))
+
+        done, _ = wait(futures)
+        for future in done:
+            # Surface detector errors to the pipeline
+            future.result()
+
+        return {detector.name: detector.result for detector in self.detectors}
+
+    def _person_region(self, buffers):
+        """
+        `(region, people)` for the cascaded detectors: the area around the people in YOLO's
+        latest result. Until YOLO has run (or without it) the whole frame, region None.
+        When that area covers more than `ROI_MAX_AREA` of the frame the whole frame too: e.g.
+        two people at opposite edges, where the crop saves little and its edges, moving with
+        both of them, keep breaking Mediapipe's tracking.
+        """
+        yolo = next((detector for detector in self.detectors if detector.name == "yolo"), None)
+        if yolo is None or not yolo.runs or not any(detector.cascade for detector in self.detectors):
+            return None, True
+        region = person_region(yolo.result, buffers.rgb.shape)
+        if region is None:
+            return None, False
+        height, width = buffers.rgb.shape[:2]
+        if (region[2] - region[0]) * (region[3] - region[1]) > ROI_MAX_AREA * width * height:
+            return None, True
+        return region, True
+
+    def active(self):
+        """ Names of the detectors whose model is ready, i.e. that run when due. """
+        return {detector.name for detector in self.detectors if not detector.model or MODELS.ready(detector.model)}
+
+    def draw(self, image, results):
+        """ Draws every detector's overlay (fresh or reused) onto the image. """
+        for detector in self.detectors:
+            if detector.draw and results.get(detector.name) is not None:
+                detector.draw(image, results[detector.name])
+        return image
+
+    def stats(self):
+        """ Per-detector target rate, run count and latency (ms). """
+        return {detector.name: detector.stats() for detector in self.detectors}
+
+    def shutdown(self):
+        if self.owns_executor:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+def create_default_scheduler(yolo_detect=run_yolo, face_model="face_mesh", hands_model="hands", executor=None):
+    """
+    Builds the YOLO / face mesh / hand tracking scheduler from `config.DETECTORS`.
+    `yolo_detect` replaces `run_yolo` (e.g. a batcher shared by several streams), the
+    `*_model` names pick the Mediapipe graphs in `MODELS`, and `executor` is a shared pool.
+    """
+    return DetectorScheduler([
+        Detector("yolo", yolo_detect, draw_detections, source="bgr", empty_result=[], model="yolo", **DETECTORS["yolo"]),
+        Detector("face", functools.partial(detect_face, model=face_model), draw_face, empty_result=EMPTY_FACE, model=face_model, cascade=ROI_CASCADE, **DETECTORS["face"]),
+        Detector("hands", functools.partial(detect_hands, model=hands_model), draw_hands, empty_result=EMPTY_HANDS, model=hands_model, cascade=ROI_CASCADE, **DETECTORS["hands"]),
+    ], executor=executor)
@@ -0,0 +1,91 @@
+# tests/test_headless.py
+"""
+`headless.py --jsonl -` end to end: replays a synthetic recording from mock_mrl.py and checks
+that stdout carries nothing but JSON events, while the models fail to load, the pipeline logs
+its stats and so on.
+"""
+import base64
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+import cv2
+import numpy as np
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from config import URI  # noqa: E402
+from recording import Recorder  # noqa: E402
+
+MRL_PORT = int(URI.rsplit(":", 1)[1].split("/")[0])
+
+
+def port_in_use(port):
+    with socket.socket() as sock:
+        return sock.connect_ex(("127.0.0.1", port)) == 0
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def web_display(jpeg, msg_id):
+    inner = json.dumps({"name": "i01.opencv", "data": "data:image/jpeg;base64," + base64.b64encode(jpeg).decode()})
+    return json.dumps({"msgId": msg_id, "name": "webgui", "method": "onWebDisplay", "sender": "i01.opencv", "data": [inner]})
+
+
+def write_recording(path, frames=30):
+    image = np.zeros((240, 320, 3), dtype=np.uint8)
+    with Recorder(path) as recorder:
+        for i in range(frames):
+            image[:] = (i * 8) % 256  # Keeps the motion gate open
+            jpeg = cv2.imencode(".jpg", image)[1].tobytes()
+            recorder.write(web_display(jpeg, 1700000000000 + i), i / 30)
+        recorder.write(json.dumps({"msgId": 1, "method": "onUtterance", "sender": "i01.chatBot", "data": [json.dumps({"text": "hello"})]}), frames / 30)
+
+
+def read_lines(stream, lines):
+    for line in iter(stream.readline, b""):
+        lines.append(line)
+
+
+@pytest.mark.skipif(port_in_use(MRL_PORT), reason=f"port {MRL_PORT} (config.URI) is in use")
+def test_jsonl_stdout_is_only_json(tmp_path):
+    recording = tmp_path / "stream.rec"
+    write_recording(str(recording))
+
+    mock = subprocess.Popen([sys.executable, "mock_mrl.py", str(recording), "--port", str(MRL_PORT), "--loop"],
+                            cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    headless = None
+    try:
+        deadline = time.monotonic() + 10
+        while not port_in_use(MRL_PORT) and time.monotonic() < deadline:
+            time.sleep(0.1)
+
+        headless = subprocess.Popen([sys.executable, "headless.py", "--jsonl", "-", "--port", str(free_port())],
+                                    cwd=ROOT, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        lines = []
+        reader = threading.Thread(target=read_lines, args=(headless.stdout, lines), daemon=True)
+        reader.start()
+
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline and sum(b'"type": "frame"' in line for line in lines) < 10:
+            time.sleep(0.2)
+    finally:
+        if headless:
+            headless.terminate()
+            headless.wait(10)
+        mock.terminate()
+        mock.wait(10)
+    reader.join(5)
+
+    assert lines, "no events on stdout"
+    events = [json.loads(line) for line in lines]
+    assert any(event["type"] == "frame" for event in events)
@@ -0,0 +1,226 @@
+# tracking.py
+import itertools
+import numpy as np
+from config import TRACK_IOU, TRACK_MAX_MISSED, TRACK_MIN_HITS, STATE_ON_DELAY, STATE_OFF_DELAY
+
+# Smoothed face/hand flags -> (event when it turns on, event when it turns off)
+STATE_EVENTS = {
+    "face_detected": ("face_appeared", "face_lost"),
+    "is_smiling": ("smile_started", "smile_ended"),
+    "is_sad": ("sad_started", "sad_ended"),
+    "hand_detected": ("hand_appeared", "hand_lost"),
+    "raised_hand": ("hand_raised", "hand_lowered"),
+}
+
+
+def iou_matrix(a, b):
+    """ IoU of every box in `a` (N, 4) with every box in `b` (M, 4), boxes as x1, y1, x2, y2. """
+    a = np.asarray(a, dtype=np.float32).reshape(-1, 4)
+    b = np.asarray(b, dtype=np.float32).reshape(-1, 4)
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    intersection = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return intersection / np.maximum(area_a[:, None] + area_b[None, :] - intersection, 1e-6)
+
+
+class Track:
+    """ One object followed across frames: its last measured box, velocity and hit/miss counts. """
+
+    def __init__(self, track_id, detection, now):
+        self.id = track_id
+        self.label = detection["label"]
+        self.box = np.asarray(detection["bbox"], dtype=np.float32)
+        self.confidence = detection["confidence"]
+        self.velocity = np.zeros(2, dtype=np.float32)  # Box center, pixels per second
+        self.updated = now
+        self.hits = 1
+        self.misses = 0
+
+    def center(self):
+        return (self.box[:2] + self.box[2:]) / 2
+
+    def match(self, detection, now):
+        box = np.asarray(detection["bbox"], dtype=np.float32)
+        dt = now - self.updated
+        if dt > 0:
+            # Smoothed so one jittery box doesn't throw the propagation off
+            self.velocity = 0.5 * self.velocity + 0.5 * ((box[:2] + box[2:]) / 2 - self.center()) / dt
+        self.box = box
+        self.confidence = detection["confidence"]
+        self.updated = now
+        self.hits += 1
+        self.misses = 0
+
+    def predicted_box(self, now, horizon=1.0):
+        """ The box moved along the velocity to `now` (at most `horizon` seconds ahead). """
+        shift = self.velocity * min(now - self.updated, horizon)
+        return self.box + np.concatenate([shift, shift])
+
+    def detection(self, box):
+        return {
+            "bbox": tuple(int(round(v)) for v in box),
+            "label": self.label,
+            "confidence": self.confidence,
+            "track_id": self.id,
+        }
+
+
+class ObjectTracker:
+    """
+    Gives YOLO detections stable IDs across frames.
+
+    Detections are matched to tracks of the same label greedily by IoU, then by center
+    distance for fast movers whose boxes no longer overlap. A track is reported once it has
+    been matched `min_hits` times and dropped after `max_missed` YOLO runs without a match.
+    On frames where YOLO doesn't run, `predict()` moves the boxes along their velocity.
+    """
+
+    def __init__(self, iou_threshold=TRACK_IOU, max_missed=TRACK_MAX_MISSED, min_hits=TRACK_MIN_HITS):
+        self.iou_threshold = iou_threshold
+        self.max_missed = max_missed
+        self.min_hits = min_hits
+        self.tracks = []
+        self.ids = itertools.count(1)
+
+    def confirmed(self):
+        return [track for track in self.tracks if track.hits >= self.min_hits]
+
+    def update(self, detections, now):
+        """ Matches a fresh YOLO result. Returns `(tracked detections, events)`. """
+        events = []
+        matched_tracks, matched_detections = set(), set()
+
+        if self.tracks and detections:
+            boxes = [track.predicted_box(now) for track in self.tracks]
+            iou = iou_matrix(boxes, [d["bbox"] for d in detections])
+            same_label = np.array([[t.label == d["label"] for d in detections] for t in self.tracks])
+            iou[~same_label] = 0.0
+
+            for t, d in zip(*np.unravel_index(np.argsort(-iou, axis=None), iou.shape)):
+                if iou[t, d] < self.iou_threshold:
+                    break
+                if t not in matched_tracks and d not in matched_detections:
+                    self._match(t, d, detections, now, events)
+                    matched_tracks.add(t)
+                    matched_detections.add(d)
+
+            # Fast movers: closest center within half the track's box diagonal
+            for t, track in enumerate(self.tracks):
+                if t in matched_tracks:
+                    continue
+                center = (boxes[t][:2] + boxes[t][2:]) / 2
+                reach = np.linalg.norm(boxes[t][2:] - boxes[t][:2]) / 2
+                candidates = [
+                    (np.linalg.norm(center - (np.asarray(det["bbox"][:2]) + det["bbox"][2:]) / 2), d)
+                    for d, det in enumerate(detections)
+                    if d not in matched_detections and same_label[t, d]
+                ]
+                if candidates:
+                    distance, d = min(candidates)
+                    if distance < reach:
+                        self._match(t, d, detections, now, events)
+                        matched_tracks.add(t)
+                        matched_detections.add(d)
+
+        for t, track in enumerate(self.tracks):
+            if t not in matched_tracks:
+                track.misses += 1
+
+        for d, detection in enumerate(detections):
+            if d not in matched_detections:
+                track = Track(next(self.ids), detection, now)
+                self.tracks.append(track)
+                if track.hits >= self.min_hits:
+                    events.append({"event": "entered", "label": track.label, "track_id": track.id})
+
+        for track in self.tracks:
+            if track.misses > self.max_missed and track.hits >= self.min_hits:
+                events.append({"event": "left", "label": track.label, "track_id": track.id})
+        self.tracks = [track for track in self.tracks if track.misses <= self.max_missed]
+
+        # Tracks missed this run keep their propagated box until they're dropped
+        return [track.detection(track.predicted_box(now) if track.misses else track.box) for track in self.confirmed()], events
+
+    def _match(self, t, d, detections, now, events):
+        track = self.tracks[t]
+        track.match(detections[d], now)
+        if track.hits == self.min_hits:
+            events.append({"event": "entered", "label": track.label, "track_id": track.id})
+
+    def predict(self, now):
+        """ Tracked detections moved to `now`, for frames where YOLO didn't run. """
+        return [track.detection(track.predicted_box(now)) for track in self.confirmed()]
+
+
+class Hysteresis:
+    """ A boolean that only flips after the raw value has disagreed for `on_delay` / `off_delay` seconds. """
+
+    def __init__(self, on_delay=STATE_ON_DELAY, off_delay=STATE_OFF_DELAY):
+        self.on_delay = on_delay
+        self.off_delay = off_delay
+        self.state = False
+        self.since = None
+
+    def update(self, raw, now):
+        """ Returns True if the state flipped. """
+        if raw == self.state:
+            self.since = None
+            return False
+        if self.since is None:
+            self.since = now
+        if now - self.since >= (self.on_delay if raw else self.off_delay):
+            self.state = raw
+            self.since = None
+            return True
+        return False
+
+
+class SceneTracker:
+    """
+    Temporal layer over the per-frame detector results of one stream.
+
+    - YOLO boxes get stable `track_id`s (`ObjectTracker`) and are propagated on frames
+      where YOLO is skipped by its rate, instead of repeating stale boxes.
+    - The face and hand flags go through `Hysteresis`, so the labels don't flicker.
+    - Changes come out as events, e.g. `{"event": "entered", "label": "person", "track_id": 3}`
+      or `{"event": "hand_raised"}` (see STATE_EVENTS).
+    """
+
+    def __init__(self):
+        self.objects = ObjectTracker()
+        self.states = {key: Hysteresis() for key in STATE_EVENTS}
+        self.detections = []
+
+    def update(self, results, ran, now, changed=True):
+        """
+        Takes the scheduler's results (`ran`: names of the detectors that ran on this frame)
+        and returns `(smoothed results, events)`.
+        """
+        events = []
+        if "yolo" in ran:
+            self.detections, object_events = self.objects.update(results["yolo"], now)
+            events.extend(object_events)
+        elif changed:
+            self.detections = self.objects.predict(now)
+        # Static frame (motion gate): keep the boxes where they are
+
+        smoothed = {"face": dict(results["face"]), "hands": dict(results["hands"])}
+        for key, (on_event, off_event) in STATE_EVENTS.items():
+            group = smoothed["face"] if key in smoothed["face"] else smoothed["hands"]
+            state = self.states[key]
+            if state.update(bool(group[key]), now):
+                events.append({"event": on_event if state.state else off_event})
+            group[key] = state.state
+
+        return {**results, "yolo": self.detections, **smoothed}, events
+
+
+def describe_event(event):
+    """ Short text for an event, e.g. "person #3 entered" or "hand raised". """
+    if "track_id" in event:
+        return f"{event['label']} #{event['track_id']} {event['event']}"
+    return event["event"].replace("_", " ")
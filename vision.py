@@ -0,0 +1,87 @@
+# vision.py
+import asyncio
+import base64
+import json
+import time
+import cv2
+from config import VISION_MAX_SIDE, VISION_JPEG_QUALITY, VISION_FRAME_MAX_AGE
+
+
+def encode_frame(image, quality=VISION_JPEG_QUALITY):
+    """ JPEG-encodes a BGR frame in memory and returns it base64-encoded, as Ollama expects. """
+    ok, jpeg = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if not ok:
+        raise RuntimeError("JPEG encoding failed")
+    return base64.b64encode(jpeg).decode("ascii")
+
+
+def downscale(image, max_side=VISION_MAX_SIDE):
+    """ Shrinks the frame so its longest side is `max_side` (vision models work at ~512px anyway). """
+    height, width = image.shape[:2]
+    scale = max_side / max(height, width)
+    if scale >= 1:
+        return image.copy()
+    return cv2.resize(image, (round(width * scale), round(height * scale)), interpolation=cv2.INTER_AREA)
+
+
+def describe_detections(result, width, height):
+    """ YOLO detections and face/hand state as a compact JSON context for the model. """
+    return json.dumps({
+        "image_size": [width, height],
+        "objects": [
+            {"label": det["label"], "confidence": round(det["confidence"], 2), "bbox": list(det["bbox"])}
+            for det in result["detections"]
+        ],
+        "face": "smiling" if result["is_smiling"] else "sad" if result["is_sad"] else "detected" if result["face_detected"] else "none",
+        "hand": "raised" if result["raised_hand"] else "detected" if result["hand_detected"] else "none",
+    })
+
+
+class VisionContext:
+    """
+    Turns the video pipeline's latest frame into a multimodal LLM message.
+
+    The frame is downscaled and JPEG-encoded once, in memory (no temp file), and the
+    encoding is cached: repeated questions about the same frame, or within
+    `max_age` seconds, reuse it instead of re-encoding.
+    """
+
+    def __init__(self, max_side=VISION_MAX_SIDE, quality=VISION_JPEG_QUALITY, max_age=VISION_FRAME_MAX_AGE):
+        self.max_side = max_side
+        self.quality = quality
+        self.max_age = max_age
+        self.cached = None  # (frame_id, encoded_at, image_b64, context)
+        self.encodes = 0
+
+    async def frame(self, pipeline):
+        """ Returns `(image_b64, context_json)` for the pipeline's latest frame, or None if there isn't one. """
+        latest = pipeline.latest_frame() if pipeline else None
+        if latest is None:
+            return None
+        frame_id, bgr, result = latest
+
+        if self.cached:
+            cached_id, encoded_at, image_b64, context = self.cached
+            if cached_id == frame_id or time.monotonic() - encoded_at < self.max_age:
+                return image_b64, context
+
+        # Downscale on the loop (the frame buffer is only stable here), encode on a thread
+        small = downscale(bgr, self.max_side)
+        image_b64 = await asyncio.to_thread(encode_frame, small, self.quality)
+        context = describe_detections(result, bgr.shape[1], bgr.shape[0])
+        self.cached = (frame_id, time.monotonic(), image_b64, context)
+        self.encodes += 1
+        return image_b64, context
+
+    def messages(self, question, image_b64, context, system_prompt):
+        return [
+            {"role": "system", "content": system_prompt},
+            {
+                "role": "user",
+                "content": f"Detections from the robot's camera (pixel boxes x1,y1,x2,y2): {context}\n\n{question}",
+                "images": [image_b64],
+            },
+        ]
+
+
+VISION = VisionContext()
@@ -1,111 +1,343 @@
 
+import asyncio
 import json
-import cv2
-import websockets
-import numpy as np
-from ultralytics import YOLO
-import mediapipe as mp
-from opencv_utils import decode_frame, run_yolo, run_mediapipe_face_detection, run_mediapipe_hand_tracking
-from config import URI
-from ollama import call_ollama
+from collections import deque
+from connection import ConnectionManager
+from pipeline import FramePipeline
+from frame_parser import loads, get_method, get_msg_id, get_frame_source, extract_frame, WEB_DISPLAY
+from config import STATS_INTERVAL, VISION_MODEL, VISION_SYSTEM_PROMPT, RECORD_PATH, STREAMS
+from inference import InferencePool
+from models import mark_phase
+from event_bus import BUS, ANY
+from logger import get_logger
+from ollama import OLLAMA, CONVERSATION, stream_sentences
+from response_cache import RESPONSE_CACHE, normalize_prompt
+from vision import VISION
+from recording import Recorder
+from metrics import METRICS, FrameTrace
+from tracking import describe_event
+
+
+# Connection to MRL, shared by the receive loop and publish_message
+connection = ConnectionManager()
+# Connections by URI when STREAMS spans several robots (includes `connection`)
+connections = {}
+# Video pipelines by stream name, and the primary stream's (shown, asked about by "Ask Vision")
+pipelines = {}
+pipeline = None
+
+log = get_logger(__name__)
+
+# Services answering the "ask" and "llm" buttons
+CHATBOT_SERVICES = {"ask": "i01.chatBot", "llm": "i01.llm"}
+# (service, question) sent with getResponse and waiting for the service's onRequest echo
+pending_questions = deque(maxlen=20)
+# service -> our question it's answering now (its onRequest echo matched a pending question)
+answering = {}
+
+
+def message_data(msg):
+    """ Decodes the first (JSON-encoded) argument of an MRL message. """
+    return loads(msg.get("data")[0])
+
+
+def register_chat_handlers(response_listbox, update_response_listbox):
+    """ Subscribes the GUI's response listbox to the chat-related MRL events. """
+
+    def on_utterance(msg):
+        utterance_text = message_data(msg).get("text")
+        log.info(f"onUtterance: {utterance_text}")
+        update_response_listbox(response_listbox, f"onUtterance: {utterance_text}")
+
+    def on_text(msg):
+        log.info(f"onText: sender:{msg.get('sender')}  {message_data(msg)}")
+
+    def on_filtered_text(msg):
+        update_response_listbox(response_listbox, f"onText: {message_data(msg)}")
+
+    def on_response(msg):
+        response_text = message_data(msg)
+        log.info(f"onResponse: {response_text}")
+        update_response_listbox(response_listbox, f"onResponse: {response_text}")
+
+    def on_request(msg):
+        request_text = message_data(msg)
+        log.info(f"onRequest: {request_text}")
+        update_response_listbox(response_listbox, f"onRequest: {request_text}")
+
+    def on_listening_event(msg):
+        log.info(f"onListeningEvent: {message_data(msg).get('text')}")
+
+    def on_llm_text(msg):
+        update_response_listbox(response_listbox, f"LLM: {message_data(msg)}")
+
+    def on_cached_response(msg):
+        update_response_listbox(response_listbox, f"Cached: {message_data(msg)}")
+
+    def on_vision_event(msg):
+        update_response_listbox(response_listbox, f"Vision: {describe_event(message_data(msg))}")
+
+    def on_any(msg):
+        log.debug(f"Received method: {msg.get('method')}")
+
+    BUS.subscribe("onUtterance", on_utterance)
+    BUS.subscribe("onText", on_text)
+    BUS.subscribe("onText", on_filtered_text, sender="htmlFilter")
+    BUS.subscribe("onResponse", on_response)
+    BUS.subscribe("onRequest", on_request)
+    BUS.subscribe("onListeningEvent", on_listening_event)
+    BUS.subscribe("onLlmText", on_llm_text)
+    BUS.subscribe("onCachedResponse", on_cached_response)
+    BUS.subscribe("onVisionEvent", on_vision_event, sender=next(iter(STREAMS)))
+    BUS.subscribe(ANY, on_any)
+
+
+async def run_client(render, streams=STREAMS):
+    """
+    GUI-independent core: receives MRL messages, runs the video pipelines and reconnects.
+
+    Every stream in `streams` (see `config.STREAMS`) gets its own pipeline, all sharing one
+    `inference.InferencePool`; streams on the same MRL share its connection and are told
+    apart by their display source. `render(result)` is called on the event loop with each
+    processed frame (see `pipeline.infer_frame`, plus the `"stream"` name); everything else
+    is dispatched on `event_bus.BUS`, including the tracker's events (`tracking.SceneTracker`)
+    as local `onVisionEvent` messages sent by the stream. Used by the Tk GUI (`subscribe_to_channel`) and by
+    `headless.py`.
+    """
+    global pipeline
+
+    pool = InferencePool(streams)
+
+    def on_result(result):
+        """ Render stage: runs on the event loop once a frame has been processed. """
+        render(result)
+        mark_phase("first frame rendered")
+        for event in result["events"]:
+            BUS.dispatch({"name": result["stream"], "sender": result["stream"], "method": "onVisionEvent", "data": [json.dumps(event)]})
+
+    # uri -> {display source (None = any): pipeline}
+    routes = {}
+    for name, (uri, source) in streams.items():
+        pipelines[name] = FramePipeline(on_result, scheduler=pool.create_scheduler(name), name=name)
+        routes.setdefault(uri, {})[source] = pipelines[name]
+    pipeline = pipelines[pool.primary]
+
+    # ✅ The primary stream's connection is the one publish_message sends commands on
+    connection.uri = streams[pool.primary][0]
+    connections.clear()
+    connections[connection.uri] = connection
+    for uri in routes:
+        if uri not in connections:
+            connections[uri] = ConnectionManager(uri)
+
+    recorder = Recorder(RECORD_PATH) if RECORD_PATH else None
+
+    def receiver(route, record):
+        by_source = list(route) != [None]
+
+        def on_message(message):
+            if record and recorder:
+                recorder.write(message)
+
+            # Fast path for the video stream: no JSON decode of the frame payload
+            if get_method(message) == WEB_DISPLAY:
+                target = (route.get(get_frame_source(message)) or route.get(None)) if by_source else route[None]
+                if target is None:
+                    return  # A camera that isn't in STREAMS
+                # MRL's send time, for the network latency: msgId comes first, before the payload
+                msg_id = get_msg_id(message, limit=256)
+                trace = FrameTrace(msg_id / 1000 if msg_id else None)
+                frame_data = extract_frame(message)
+                if frame_data is not None:
+                    trace.mark("parse")
+                    # ✅ Latest frame wins: a frame still waiting for the decoder is replaced
+                    target.submit(frame_data, trace)
+                return
+
+            if message != b"X":
+                BUS.dispatch(loads(message))
+
+        return on_message
+
+    for name, stream_pipeline in pipelines.items():
+        stream_pipeline.start()
+        stream_pipeline.register_metrics(METRICS, prefix="" if stream_pipeline is pipeline else f"{name}_")
+
+    # ✅ Each connection reconnects on its own; publish_message queues while disconnected
+    for uri, manager in connections.items():
+        manager.on_message = receiver(routes.get(uri, {}), record=manager is connection)
+        manager.register_metrics(METRICS, prefix="" if manager is connection else f"{next(iter(routes[uri].values())).name}_")
+    connection.on_connect = lambda: mark_phase("WebSocket connected")
+    stats_task = asyncio.create_task(log_stats())
 
+    try:
+        await asyncio.gather(*(manager.run() for manager in connections.values()))
+    finally:
+        stats_task.cancel()
+        for stream_pipeline in pipelines.values():
+            await stream_pipeline.stop()
+        pool.shutdown()
+        if recorder:
+            recorder.close()
+            log.info(f"Recorded {recorder.frames} frames and {recorder.messages} messages to {RECORD_PATH}")
 
-websocket = None
-# Hack to skip every other frame
-skip = False
 
 async def subscribe_to_channel(video_label, detected_items_listbox, response_listbox, raised_hand_label, face_label, update_video_feed, update_detected_items, update_response_listbox):
-    """ Handles WebSocket subscription and processes incoming messages. """
-    global websocket
-    global skip
+    """
+    Handles WebSocket subscription and processes incoming messages for the Tk GUI.
+    Processed frames and chat events are shown in the given widgets.
+    """
+
+    def render(result):
+        if result["stream"] != pipeline.name:
+            return  # The GUI shows the primary stream
+        # ✅ Call `update_video_feed` correctly
+        update_video_feed(video_label, result["image"], result["detections"], result["face_detected"], result["is_smiling"], result["is_sad"], result["hand_detected"], result["raised_hand"], raised_hand_label, face_label)
+
+        detected_items = [f"{det['label']} ({det['confidence']:.2f})" for det in result["detections"]]
+        update_detected_items(detected_items_listbox, detected_items)
+
+    register_chat_handlers(response_listbox, update_response_listbox)
+    await run_client(render)
+
+
+async def log_stats():
+    """ Logs video pipeline and connection stats every STATS_INTERVAL seconds. """
+    while True:
+        await asyncio.sleep(STATS_INTERVAL)
+        for name, stream_pipeline in pipelines.items():
+            log.info(f"Video stats ({name}): {stream_pipeline.stats()}")
+        for uri, manager in connections.items():
+            log.info(f"Connection stats ({uri}): {manager.stats()}")
+        log.info(f"Frame latency (p50/p95 ms): {METRICS.summary()}")
+
+
+async def as_stream(text):
+    yield text
+
+
+def response_text(msg):
+    """ Text of an MRL `onResponse` (a Response object with `msg`, or a plain string). """
+    data = message_data(msg)
+    return data.get("msg") if isinstance(data, dict) else data
+
+
+def request_text(msg):
+    """ Text of an MRL `onRequest` (a Request object with `text`, or a plain string). """
+    data = message_data(msg)
+    return data.get("text") if isinstance(data, dict) else data
+
+
+def track_chatbot_request(msg):
+    """
+    Matches a chatbot's `onRequest` echo to a question sent with the buttons. Only the answer
+    to a matched request is cached: requests from elsewhere (e.g. speech) reset the service.
+    """
+    sender = msg.get("sender", "")
+    text = normalize_prompt(str(request_text(msg) or ""))
+    for service in CHATBOT_SERVICES.values():
+        if service in sender:
+            answering.pop(service, None)
+    match = next((q for q in pending_questions if q[0] in sender and normalize_prompt(q[1]) == text), None)
+    if match:
+        pending_questions.remove(match)
+        service, question = match
+        answering[service] = question
+
+
+def cache_chatbot_response(msg):
+    """ Caches a chatbot's answer if it answers one of our questions (see `track_chatbot_request`). """
+    sender = msg.get("sender", "")
+    service = next((service for service in answering if service in sender), None)
+    if service is None:
+        return
+    RESPONSE_CACHE.put(answering.pop(service), response_text(msg), service)
+
+
+BUS.subscribe("onRequest", track_chatbot_request)
+BUS.subscribe("onResponse", cache_chatbot_response)
+
+
+async def answer_with_llm(user_text):
+    """
+    Streams an Ollama answer sentence by sentence: each sentence goes to the response
+    listbox (as a local `onLlmText` event) and to the robot's speech as soon as it's
+    complete, so the robot starts talking after the first sentence.
+    Only the opening question of a conversation is cached: a follow-up like "why?" depends
+    on the history.
+    """
+    cacheable = CONVERSATION.is_fresh()
+    cached = RESPONSE_CACHE.get(user_text, CONVERSATION.model, CONVERSATION.system_prompt) if cacheable else None
+    if cached is not None:
+        log.info(f"LLM answer from cache: {RESPONSE_CACHE.stats()}")
+        CONVERSATION.record(user_text, cached)
+        tokens = as_stream(cached)
+    else:
+        tokens = CONVERSATION.ask(user_text)
 
     try:
-        websocket = await websockets.connect(URI, ping_interval=None, max_size=None, compression="deflate")
-        print("Connected to WebSocket server.")
-
-        while True:
-            message = await websocket.recv()
-            if message != "X":
-                msg = json.loads(message)
-
-                # Process different types of messages
-                if msg.get("method") == "onUtterance":
-                    utterance_text = json.loads(msg.get('data')[0]).get('text')
-                    print(f"onUtterance: {utterance_text}")
-                    update_response_listbox(response_listbox, f"onUtterance: {utterance_text}")
-
-                if msg.get("method") == "onText":
-                    text_message = json.loads(msg.get('data')[0])
-                    print(f"onText: sender:{msg.get("sender")}  {text_message}")
-
-                    if "htmlFilter" in msg.get("sender", ""):
-                        update_response_listbox(response_listbox, f"onText: {text_message}")
-                
-                if msg.get("method") == "onResponse":
-                    response_text = json.loads(msg.get('data')[0])
-                    print(f"onResponse: {response_text}")
-                    update_response_listbox(response_listbox, f"onResponse: {response_text}")
-
-                if msg.get("method") == "onRequest":
-                    request_text = json.loads(msg.get('data')[0])
-                    print(f"onRequest: {request_text}")
-                    update_response_listbox(response_listbox, f"onRequest: {request_text}")
-
-                if msg.get("method") == "onListeningEvent":
-                    listening_text = json.loads(msg.get('data')[0]).get('text')
-                    print(f"onListeningEvent: {listening_text}")
-                    #update_response_listbox(response_listbox, f"onListeningEvent: {listening_text}")
-
-                if msg.get("method") != "onWebDisplay":
-                    print(f"Received method: {msg.get('method')}")
-
-                # Handle image stream from WebSocket
-                if msg.get("method") == "onWebDisplay":
-                    
-                    frame_data = json.loads(msg.get("data")[0]).get("data").replace("data:image/jpg;base64,", "")
-
-                    skip = not skip
-
-                    if skip == False: 
-                        image = decode_frame(frame_data)
-
-                        # ✅ Process with YOLO & Mediapipe
-                        detections = run_yolo(image)
-
-                        # Draw the boxes
-                        # Use YOLOv8 for object detection
-                        for detection in detections:
-                            x1, y1, x2, y2 = detection["bbox"]
-                            label = detection["label"]
-                            confidence = detection["confidence"]
-
-                            # Draw bounding boxes for all detected objects
-                            cv2.rectangle(image, (x1, y1), (x2, y2), (0, 255, 0), 2)
-
-                            # Draw labels
-                            label_text = f"{label} ({confidence:.2f})"
-                            cv2.putText(image, label_text, (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
-
-                        face_detected, is_smiling, is_sad, image = run_mediapipe_face_detection(image)
-                        hand_detected, raised_hand, image = run_mediapipe_hand_tracking(image)
-
-                        # ✅ Call `update_video_feed` correctly
-                        update_video_feed(video_label, image, detections, face_detected, is_smiling, is_sad, hand_detected, raised_hand, raised_hand_label, face_label)
+        answer = []
+        async for sentence in stream_sentences(tokens):
+            answer.append(sentence)
+            BUS.dispatch({"name": "ollama", "method": "onLlmText", "data": [json.dumps(sentence)]})
+            await publish_message("say", sentence)
+
+        # Only complete (not cancelled) answers are cached
+        if cacheable and cached is None:
+            RESPONSE_CACHE.put(user_text, " ".join(answer), CONVERSATION.model, CONVERSATION.system_prompt)
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        log.error(f"LLM error: {e}")
 
-                        detected_items = [f"{det['label']} ({det['confidence']:.2f})" for det in detections]
-                        update_detected_items(detected_items_listbox, detected_items)
 
+async def answer_about_frame(question):
+    """ Asks the vision model about the latest processed frame, speaking the answer as it streams. """
+    frame = await VISION.frame(pipeline)
+    if frame is None:
+        log.warning("No video frame to ask about yet.")
+        return
 
+    image_b64, context = frame
+    tokens = OLLAMA.stream_chat(VISION_MODEL, VISION.messages(question, image_b64, context, VISION_SYSTEM_PROMPT), keep_alive=CONVERSATION.keep_alive)
+    try:
+        async for sentence in stream_sentences(tokens):
+            BUS.dispatch({"name": "ollama", "method": "onLlmText", "data": [json.dumps(sentence)]})
+            await publish_message("say", sentence)
+    except asyncio.CancelledError:
+        raise
     except Exception as e:
-        print(f"WebSocket error: {e}")
+        log.error(f"Vision LLM error: {e}")
 
 
 async def publish_message(message_type, user_text):
-    """ Publishes a message to the WebSocket server. """
-    global websocket
-    if websocket is None:
-        print("WebSocket not connected!")
+    """
+    Publishes a message to the WebSocket server. Messages are queued by the connection
+    manager, so they're delivered after a reconnect if the robot is currently unreachable.
+    """
+
+    # ✅ LLM answers stream from Ollama in the background, the event loop keeps running
+    if message_type == "askllm":
+        OLLAMA.run(answer_with_llm(user_text))
         return
+    if message_type == "askvision":
+        OLLAMA.run(answer_about_frame(user_text or "What do you see?"))
+        return
+    if message_type == "stopllm":
+        if OLLAMA.cancel():
+            log.info("LLM answer cancelled.")
+        return
+    if message_type == "resetllm":
+        OLLAMA.cancel()
+        CONVERSATION.reset()
+        log.info("LLM conversation reset.")
+        return
+
+    if not connection.connected:
+        log.warning("WebSocket not connected, message queued.")
+
+    # Commands with a key replace each other when sent in a burst
+    key = None
 
     try:
         if message_type == "say":
@@ -114,53 +346,41 @@ async def publish_message(message_type, user_text):
                 "method": "publishText",
                 "data": [json.dumps(user_text)]
             })
-        elif message_type == "ask":
-            publish_message = json.dumps({
-                "name": "i01.chatBot",
-                "method": "getResponse",
-                "data": [json.dumps(user_text)]
-            })
-        elif message_type == "llm":
+        elif message_type in CHATBOT_SERVICES:
+            service = CHATBOT_SERVICES[message_type]
+
+            # ✅ Answer common questions from the cache: just say the stored answer
+            cached = RESPONSE_CACHE.get(user_text, service)
+            if cached is not None:
+                log.info(f"{service} answer from cache: {RESPONSE_CACHE.stats()}")
+                BUS.dispatch({"name": "cache", "method": "onCachedResponse", "data": [json.dumps(cached)]})
+                await publish_message("say", cached)
+                return
+
+            pending_questions.append((service, user_text))
             publish_message = json.dumps({
-                "name": "i01.llm",
+                "name": service,
                 "method": "getResponse",
                 "data": [json.dumps(user_text)]
             })
         elif message_type == "start":
+            key = "i01.ear.recording"
             publish_message = json.dumps({
                 "name": "i01.ear",
                 "method": "startRecording"
             })
         elif message_type == "stop":
+            key = "i01.ear.recording"
             publish_message = json.dumps({
                 "name": "i01.ear",
                 "method": "stopRecording"
             })
-        elif message_type == "askllm":
-
-            # Example usage
-            history = [
-                {"role": "user", "content": "Hello, who are you?"},
-                {"role": "assistant", "content": "I am an AI assistant created to help you!"}
-            ]
-
-            response = call_ollama(
-                model="llama3.2",
-                system_prompt="You are a friendly AI assistant.",
-                history=history,
-                user_prompt=user_text
-                 # Change to a valid image file
-            )
-
-            print(response)
-            return
-
         else:
-            print("Invalid message type!")
+            log.warning("Invalid message type!")
             return
 
-        await websocket.send(publish_message)
-        print(f"Published message: {publish_message}")
+        connection.send(publish_message, key=key)
+        log.info(f"Published message: {publish_message}")
 
     except Exception as e:
-        print(f"Error while publishing: {e}")
\ No newline at end of file
+        log.error(f"Error while publishing: {e}")
\ No newline at end of file
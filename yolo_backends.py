@@ -0,0 +1,265 @@
+# yolo_backends.py
+import ast
+import os
+import time
+import cv2
+import numpy as np
+from logger import get_logger
+
+log = get_logger(__name__)
+
+
+def boxes_to_detections(xyxy, conf, cls, names):
+    """
+    Converts box arrays into the detection dicts used by the GUI, in one NumPy pass.
+    - `xyxy`: (N, 4) boxes in frame pixels, `conf`: (N,) scores, `cls`: (N,) class ids.
+    - `names`: class id -> label (dict or list).
+    """
+    if len(xyxy) == 0:
+        return []
+    boxes = np.asarray(xyxy).astype(np.int32).tolist()
+    scores = np.asarray(conf, dtype=np.float32).tolist()
+    class_ids = np.asarray(cls).astype(np.int32).tolist()
+    return [
+        {"bbox": tuple(box), "label": names[class_id], "confidence": score}
+        for box, score, class_id in zip(boxes, scores, class_ids)
+    ]
+
+
+class YoloBackend:
+    """
+    Base class for YOLO inference backends.
+    `predict(image)` takes a BGR frame and returns `(xyxy, conf, cls)` NumPy arrays in frame pixels.
+    `predict_batch(images)` does the same for several frames, in one inference where the backend can.
+    """
+
+    name = "base"
+
+    def __init__(self, weights, imgsz=640, conf=0.25, iou=0.45):
+        self.weights = weights
+        self.imgsz = imgsz
+        self.conf = conf
+        self.iou = iou
+        self.names = {}
+
+    def predict(self, image):
+        raise NotImplementedError
+
+    def predict_batch(self, images):
+        return [self.predict(image) for image in images]
+
+    def warmup(self, shape=(768, 1024, 3), runs=2):
+        """ Runs a few dummy inferences so the first real frame doesn't pay for lazy init. """
+        dummy = np.zeros(shape, dtype=np.uint8)
+        start = time.perf_counter()
+        for _ in range(runs):
+            self.predict(dummy)
+        return time.perf_counter() - start
+
+
+class UltralyticsBackend(YoloBackend):
+    """ The ultralytics PyTorch model, as before. """
+
+    name = "ultralytics"
+
+    def __init__(self, weights, imgsz=640, conf=0.25, iou=0.45):
+        super().__init__(weights, imgsz, conf, iou)
+        from ultralytics import YOLO
+        self.model = YOLO(weights)
+        self.names = self.model.names
+
+    def predict(self, image):
+        return self.predict_batch([image])[0]
+
+    def predict_batch(self, images):
+        results = self.model.predict(images, imgsz=self.imgsz, conf=self.conf, iou=self.iou, verbose=False)
+        return [(r.boxes.xyxy.cpu().numpy(), r.boxes.conf.cpu().numpy(), r.boxes.cls.cpu().numpy()) for r in results]
+
+
+class ExportedBackend(YoloBackend):
+    """
+    Shared pre/post-processing for models exported from ultralytics (ONNX, OpenVINO):
+    letterbox into a reused input blob, then decode the raw (1, 4 + classes, anchors)
+    output with vectorized NumPy and OpenCV's batched NMS.
+
+    Models exported with a dynamic batch axis (`max_batch` > 1) run `predict_batch` as one
+    inference over a (N, 3, imgsz, imgsz) blob; others run the frames one by one.
+    """
+
+    export_format = None
+    max_batch = 1
+
+    def __init__(self, weights, imgsz=640, conf=0.25, iou=0.45):
+        super().__init__(weights, imgsz, conf, iou)
+        self.blob = np.empty((1, 3, imgsz, imgsz), dtype=np.float32)
+        self.canvas = np.full((imgsz, imgsz, 3), 114, dtype=np.uint8)
+        self.resized = None
+
+    def export(self):
+        """
+        Exports the .pt weights with ultralytics (once per input size) and returns the exported
+        path, e.g. `yolov8n_640.onnx`: the exported input size is fixed, so each size gets its own.
+        """
+        base, ext = os.path.splitext(self.weights)
+        if ext != ".pt":
+            return self.weights
+        target = f"{base}_{self.imgsz}.onnx" if self.export_format == "onnx" else f"{base}_{self.imgsz}_openvino_model"
+        if not os.path.exists(target):
+            from ultralytics import YOLO
+            log.info(f"Exporting {self.weights} to {self.export_format} (imgsz={self.imgsz})...")
+            # Dynamic axes so frames from several streams can share one inference; ultralytics
+            # makes height and width dynamic too, so those are pinned back to imgsz
+            exported = YOLO(self.weights).export(format=self.export_format, imgsz=self.imgsz, dynamic=True)
+            self.pin_input_size(exported)
+            os.replace(exported, target)
+        return target
+
+    def pin_input_size(self, path):
+        """ Fixes the exported model's input to (batch, 3, imgsz, imgsz), leaving only the batch axis dynamic. """
+        raise NotImplementedError
+
+    def preprocess(self, image, index=0):
+        height, width = image.shape[:2]
+        scale = min(self.imgsz / height, self.imgsz / width)
+        new_w, new_h = round(width * scale), round(height * scale)
+        pad_x, pad_y = (self.imgsz - new_w) // 2, (self.imgsz - new_h) // 2
+
+        if self.resized is None or self.resized.shape[:2] != (new_h, new_w):
+            self.resized = np.empty((new_h, new_w, 3), dtype=np.uint8)
+            self.canvas[:] = 114
+        cv2.resize(image, (new_w, new_h), dst=self.resized, interpolation=cv2.INTER_LINEAR)
+        self.canvas[pad_y:pad_y + new_h, pad_x:pad_x + new_w] = self.resized
+
+        # HWC BGR uint8 -> NCHW RGB float32 [0, 1], written into the reused blob
+        np.multiply(self.canvas[:, :, ::-1].transpose(2, 0, 1), 1 / 255.0, out=self.blob[index], casting="unsafe")
+        return scale, pad_x, pad_y
+
+    def postprocess(self, output, scale, pad_x, pad_y, shape):
+        predictions = output[0].T  # (anchors, 4 + classes)
+        scores = predictions[:, 4:]
+        cls = scores.argmax(axis=1)
+        conf = scores[np.arange(len(cls)), cls]
+
+        keep = conf >= self.conf
+        boxes, conf, cls = predictions[keep, :4], conf[keep], cls[keep]
+        if not len(conf):
+            return np.empty((0, 4), np.float32), conf, cls
+
+        # cx, cy, w, h -> x, y, w, h for NMS
+        xywh = boxes.copy()
+        xywh[:, :2] -= boxes[:, 2:] / 2
+        indices = cv2.dnn.NMSBoxesBatched(xywh.tolist(), conf.tolist(), cls.tolist(), self.conf, self.iou)
+        indices = np.asarray(indices, dtype=np.int64).reshape(-1)
+
+        xyxy = np.concatenate([xywh[indices, :2], xywh[indices, :2] + xywh[indices, 2:]], axis=1)
+        xyxy -= (pad_x, pad_y, pad_x, pad_y)
+        xyxy /= scale
+        np.clip(xyxy, 0, (shape[1], shape[0], shape[1], shape[0]), out=xyxy)
+        return xyxy, conf[indices], cls[indices]
+
+    def infer(self, count=1):
+        """ Runs the model on the first `count` images of the blob, returns the raw output. """
+        raise NotImplementedError
+
+    def predict(self, image):
+        scale, pad_x, pad_y = self.preprocess(image)
+        return self.postprocess(self.infer(), scale, pad_x, pad_y, image.shape)
+
+    def predict_batch(self, images):
+        if self.max_batch == 1 or len(images) == 1:
+            return super().predict_batch(images)
+
+        results = []
+        for start in range(0, len(images), self.max_batch):
+            chunk = images[start:start + self.max_batch]
+            if len(self.blob) < len(chunk):
+                self.blob = np.empty((len(chunk), 3, self.imgsz, self.imgsz), dtype=np.float32)
+            letterbox = [self.preprocess(image, i) for i, image in enumerate(chunk)]
+            output = self.infer(len(chunk))
+            results.extend(self.postprocess(output[i:i + 1], *letterbox[i], image.shape) for i, image in enumerate(chunk))
+        return results
+
+
+class OnnxRuntimeBackend(ExportedBackend):
+    """ ONNX Runtime CPU session on the exported model (`pip install onnxruntime`). """
+
+    name = "onnx"
+    export_format = "onnx"
+
+    def __init__(self, weights, imgsz=640, conf=0.25, iou=0.45):
+        super().__init__(weights, imgsz, conf, iou)
+        import onnxruntime as ort
+        path = self.export()
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+        # A symbolic (non-int) batch dimension means the model was exported with dynamic=True
+        if not isinstance(self.session.get_inputs()[0].shape[0], int):
+            self.max_batch = 8
+        metadata = self.session.get_modelmeta().custom_metadata_map
+        self.names = ast.literal_eval(metadata["names"]) if "names" in metadata else {}
+
+    def pin_input_size(self, path):
+        import onnx
+        model = onnx.load(path)
+        for dim in model.graph.input[0].type.tensor_type.shape.dim[2:]:
+            dim.dim_value = self.imgsz
+        onnx.save(model, path)
+
+    def infer(self, count=1):
+        return self.session.run(None, {self.input_name: self.blob[:count]})[0]
+
+
+class OpenVinoBackend(ExportedBackend):
+    """ OpenVINO CPU plugin on the exported model (`pip install openvino`). """
+
+    name = "openvino"
+    export_format = "openvino"
+
+    def __init__(self, weights, imgsz=640, conf=0.25, iou=0.45):
+        super().__init__(weights, imgsz, conf, iou)
+        import openvino as ov
+        import yaml
+        path = self.export()
+        core = ov.Core()
+        self.compiled = core.compile_model(core.read_model(self.model_xml(path)), "CPU", {"PERFORMANCE_HINT": "LATENCY"})
+        self.output = self.compiled.output(0)
+        # As for ONNX: a dynamic batch dimension means several frames can share one inference
+        if self.compiled.input(0).get_partial_shape()[0].is_dynamic:
+            self.max_batch = 8
+        with open(os.path.join(path, "metadata.yaml")) as f:
+            self.names = yaml.safe_load(f).get("names", {})
+
+    @staticmethod
+    def model_xml(path):
+        return next(os.path.join(path, f) for f in os.listdir(path) if f.endswith(".xml"))
+
+    def pin_input_size(self, path):
+        import openvino as ov
+        xml = self.model_xml(path)
+        model = ov.Core().read_model(xml)
+        model.reshape([-1, 3, self.imgsz, self.imgsz])
+        # Saved next to the original first: its weights may still be memory-mapped
+        pinned = xml[:-len(".xml")] + "_pinned.xml"
+        ov.save_model(model, pinned, compress_to_fp16=False)
+        del model
+        os.replace(pinned, xml)
+        os.replace(pinned[:-len(".xml")] + ".bin", xml[:-len(".xml")] + ".bin")
+
+    def infer(self, count=1):
+        return self.compiled(self.blob[:count])[self.output]
+
+
+BACKENDS = {
+    UltralyticsBackend.name: UltralyticsBackend,
+    OnnxRuntimeBackend.name: OnnxRuntimeBackend,
+    OpenVinoBackend.name: OpenVinoBackend,
+}
+
+
+def create_backend(name, weights, imgsz=640, conf=0.25, iou=0.45):
+    """ Creates a YOLO backend by name: "ultralytics", "onnx" or "openvino". """
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown YOLO backend '{name}', expected one of: {', '.join(BACKENDS)}")
+    return BACKENDS[name](weights, imgsz, conf, iou)